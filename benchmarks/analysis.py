@@ -0,0 +1,121 @@
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from dlqmc import synthetic
+from dlqmc.analysis import (
+    ewm_trajectory,
+    infinite_training_limit,
+    infinite_training_limits,
+    reblock,
+)
+
+# measure the computations, Memoization covers the cache itself
+os.environ['DLQMC_CACHE'] = '0'
+
+N_RUNS = 24
+N_STEPS = 2_000
+N_BLOCKS = 200
+N_WALKERS = 500
+
+
+class Trajectories:
+    def setup(self):
+        rng = np.random.default_rng(0)
+        self.E_mean = synthetic.training_energies(rng, N_STEPS, N_RUNS).T
+        self.blocks = synthetic.sampled_blocks(rng, N_BLOCKS, N_RUNS * N_WALKERS)
+        self.blocks = self.blocks[..., 0].reshape(N_BLOCKS, N_RUNS, -1).swapaxes(0, 1)
+
+    def time_ewm_trajectory(self):
+        ewm_trajectory(self.E_mean)
+
+    def peakmem_ewm_trajectory(self):
+        ewm_trajectory(self.E_mean)
+
+    def time_infinite_training_limit(self):
+        infinite_training_limit(self.E_mean[0], 100)
+
+    def time_infinite_training_limits(self):
+        infinite_training_limits(self.E_mean, 100)
+
+    def peakmem_infinite_training_limits(self):
+        infinite_training_limits(self.E_mean, 100)
+
+    def time_reblock(self):
+        reblock(self.blocks)
+
+    def peakmem_reblock(self):
+        reblock(self.blocks)
+
+
+class Memoization:
+    def setup(self):
+        self.E_mean = synthetic.training_energies(
+            np.random.default_rng(0), N_STEPS, N_RUNS
+        ).T
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.environ.update(DLQMC_CACHE='1', DLQMC_CACHE_DIR=self.tmpdir.name)
+        ewm_trajectory(self.E_mean)
+
+    def teardown(self):
+        os.environ['DLQMC_CACHE'] = '0'
+        self.tmpdir.cleanup()
+
+    def time_ewm_trajectory_hit(self):
+        ewm_trajectory(self.E_mean)
+
+
+class Collect:
+    timeout = 300
+
+    def setup_cache(self):
+        root = Path('collect').resolve()
+        synthetic.write_run_tree(
+            root, n_systems=8, n_ansatzes=4, n_blocks=N_BLOCKS, n_walkers=N_WALKERS
+        )
+        return str(root)
+
+    def time_collect_all_systems(self, root):
+        from dlqmc.experiments import collect_all_systems
+
+        collect_all_systems(root, workers=2, cache=False)
+
+    def peakmem_collect_all_systems(self, root):
+        from dlqmc.experiments import collect_all_systems
+
+        collect_all_systems(root, workers=2, cache=False)
+
+
+class Pipeline:
+    timeout = 600
+    params = [
+        'h10',
+        'small-systems',
+        'diatomics',
+        'learning-curves',
+        'cyclobutadiene-fit',
+        'cyclobutadiene-sample',
+    ]
+    param_names = ['stage']
+
+    def setup_cache(self):
+        root = Path('pipeline').resolve()
+        synthetic.write_pub_files(
+            root, n_blocks=N_BLOCKS, n_walkers=N_WALKERS, n_steps=N_STEPS
+        )
+        synthetic.write_cyclobutadiene(
+            root, n_steps=N_STEPS, n_blocks=N_BLOCKS, n_walkers=N_WALKERS
+        )
+        return str(root)
+
+    def time_stage(self, root, name):
+        from dlqmc.pipeline import run_stage
+
+        run_stage(name, Path(root))
+
+    def peakmem_stage(self, root, name):
+        from dlqmc.pipeline import run_stage
+
+        run_stage(name, Path(root))
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ['torch', 'numpy', 'pandas', 'tables', 'h5py', 'uncertainties']
+
+
+def timeraw_import_cli():
+    return 'import dlqmc.cli'
+
+
+def timeraw_prepare_help():
+    return """
+import contextlib, io
+from dlqmc.cli import cli
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        cli(['prepare', '.', '--help'])
+    except SystemExit:
+        pass
+"""
+
+
+def _heavy_imports(args):
+    code = f"""
+import contextlib, io, sys
+from dlqmc.cli import cli
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        cli({args!r})
+    except SystemExit:
+        pass
+print(sum(m in sys.modules for m in {HEAVY_MODULES!r}))
+"""
+    out = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True
+    )
+    return int(out.stdout.split()[-1])
+
+
+def track_heavy_imports_help():
+    return _heavy_imports(['--help'])
+
+
+def track_heavy_imports_prepare_help():
+    return _heavy_imports(['prepare', '.', '--help'])
+
+
+track_heavy_imports_help.unit = 'modules'
+track_heavy_imports_prepare_help.unit = 'modules'
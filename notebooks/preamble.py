@@ -62,9 +62,8 @@ from deepqmc.utils import (
 )
 from deepqmc.wf import PauliNet
 from deepqmc.wf.paulinet import ElectronicSchNet, OmniSchNet, SubnetFactory
-from dlqmc.analysis import ewm_full, infinite_training_limit
+from dlqmc.analysis import infinite_training_limit
 from dlqmc.experiments import collect_all_systems
-from dlqmc.plot import ewm, plot_training
 from dlqmc.tools import short_fmt
 
 logging.basicConfig(
@@ -1,22 +1,248 @@
+import warnings
+
 import numpy as np
-import scipy.optimize
-from uncertainties import unumpy as unp
 
-from deepqmc.ewm import ewm
+from .cache import memoize
+from .uarray import UArray
+
+
+def ewm_at(Y, x, alpha, thre=1e-10, max_elems=2 ** 22):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    X = np.arange(Y.shape[1])
+    mask = np.isfinite(Y).astype(float)
+    offset = np.nanmean(Y, axis=-1, keepdims=True)
+    Y = np.where(mask > 0, Y - offset, 0)
+    mean = np.empty((len(Y), len(x)))
+    err = np.empty_like(mean)
+    chunk = max(1, max_elems // len(X))
+    for i in range(0, len(x), chunk):
+        sl = slice(i, i + chunk)
+        deltas = -np.log(alpha[sl])[:, None] * (x[sl, None] - X)
+        in_window = (0 <= deltas) & (deltas < -np.log(thre))
+        ws = np.where(in_window, np.exp(-np.abs(deltas)), 0)
+        ws2 = ws ** 2
+        norm = mask @ ws.T
+        mean_i = (Y @ ws.T) / norm
+        sqdev = Y ** 2 @ ws2.T - 2 * mean_i * (Y @ ws2.T) + mean_i ** 2 * (mask @ ws2.T)
+        mean[:, sl] = mean_i + offset
+        err[:, sl] = np.sqrt(np.maximum(sqdev, 0)) / norm
+    return mean, err
+
+
+def _wls_sums(u, y, err):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where(np.isfinite(y) & (err > 0), err ** -2.0, 0)
+    wy = np.where(w > 0, w * y, 0)
+    return np.stack([w.sum(-1), w @ u, w @ u ** 2, wy.sum(-1), wy @ u], -1)
+
+
+def _wls_line(sums):
+    S, Su, Suu, Sy, Suy = np.moveaxis(sums, -1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        det = S * Suu - Su ** 2
+        intercept = UArray((Suu * Sy - Su * Suy) / det, np.sqrt(Suu / det))
+        slope = UArray((S * Suy - Su * Sy) / det, np.sqrt(S / det))
+    return intercept, slope
+
+
+def _itl_alpha(step):
+    return 1 - 1 / (2 + step / 20)
+
+
+@memoize()
+def infinite_training_limits(energy, start):
+    energy = np.atleast_2d(np.asarray(energy, dtype=float))
+    n_valid = energy.shape[1] - np.isfinite(energy[:, ::-1]).argmax(axis=-1)
+    step = np.arange(start, energy.shape[1])
+    E_ewm, E_err = ewm_at(energy, step, _itl_alpha(step))
+    sums = _wls_sums(1 / step, E_ewm, np.where(step < n_valid[:, None], E_err, 0))
+    Einf, slope = _wls_line(sums)
+    return Einf, slope, (E_ewm, E_err)
+
+
+class InfiniteTrainingLimit:
+    def __init__(self, start):
+        self.start = start
+        self.energy = np.empty(0)
+        self._sums = np.zeros(5)
+
+    def update(self, energy):
+        n_old = len(self.energy)
+        self.energy = np.concatenate([self.energy, energy])
+        step = np.arange(max(self.start, n_old), len(self.energy))
+        if len(step):
+            E_ewm, E_err = ewm_at(self.energy, step, _itl_alpha(step))
+            self._sums += _wls_sums(1 / step, E_ewm[0], E_err[0])
+        return self
+
+    @property
+    def Einf(self):
+        return _wls_line(self._sums)[0]
+
+    @property
+    def slope(self):
+        return _wls_line(self._sums)[1]
 
 
 def infinite_training_limit(energy, start):
-    step = np.arange(len(energy))
-    step2 = np.arange(start, len(energy))
-    E_ewm = ewm(
-        step2, step, energy, (1 - 1 / (2 + step2 / 20))[:, None], with_err=True,
-    )
-    param = scipy.optimize.curve_fit(
-        lambda x, Einf, slope: Einf + slope * x,
-        1 / step2,
-        unp.nominal_values(E_ewm),
-        sigma=unp.std_devs(E_ewm),
-        absolute_sigma=True,
-    )
-    param = unp.uarray(param[0], np.sqrt(np.diag(param[1])))
-    return param[0], param[1], E_ewm
+    Einf, slope, (E_ewm, E_err) = infinite_training_limits(energy, start)
+    return Einf[0], slope[0], UArray(E_ewm[0], E_err[0])
+
+
+class MeanErrAccumulator:
+    def __init__(self):
+        self.n = 0
+        self.walker_mean = None
+        self.walker_m2 = None
+
+    def _combine(self, n, mean, m2):
+        if not self.n:
+            self.n, self.walker_mean, self.walker_m2 = n, mean, m2
+            return
+        n_tot = self.n + n
+        delta = mean - self.walker_mean
+        self.walker_mean = self.walker_mean + delta * (n / n_tot)
+        self.walker_m2 = self.walker_m2 + m2 + delta ** 2 * (self.n * n / n_tot)
+        self.n = n_tot
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        if len(x):
+            mean = x.mean(axis=0)
+            self._combine(len(x), mean, ((x - mean) ** 2).sum(axis=0))
+        return self
+
+    def update_from(self, dataset, index=(), chunk_size=256):
+        for start in range(0, len(dataset), chunk_size):
+            key = slice(start, start + chunk_size)
+            self.update(dataset[(key, *index)] if index else dataset[key])
+        return self
+
+    def merge(self, other):
+        if other.n:
+            self._combine(other.n, other.walker_mean, other.walker_m2)
+        return self
+
+    @property
+    def walker_var(self):
+        return self.walker_m2 / self.n
+
+    @property
+    def mean(self):
+        return self.walker_mean.mean()
+
+    @property
+    def err(self):
+        return self.walker_mean.std() / np.sqrt(len(self.walker_mean))
+
+
+@memoize()
+def mean_err(dataset, index=(), chunk_size=256):
+    acc = MeanErrAccumulator().update_from(dataset, index, chunk_size)
+    return acc.mean, acc.err
+
+
+@memoize()
+def reblock(x, min_blocks=16):
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        x = x[:, None]
+    blocks = x if x.ndim == 3 else x[None]
+    n_steps = np.isfinite(blocks).any(axis=-1).sum(axis=-1)
+    mean = np.nanmean(blocks, axis=(1, 2))
+    errs = []
+    while not errs or blocks.shape[1] >= min_blocks:
+        n = np.isfinite(blocks).sum(axis=(1, 2))
+        sqdev = np.nansum((blocks - mean[:, None, None]) ** 2, axis=(1, 2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            err = np.sqrt(sqdev / (n - 1) / n)
+        n_blocks = np.isfinite(blocks).any(axis=-1).sum(axis=-1)
+        errs.append(np.where((n_blocks >= min_blocks) | (not errs), err, np.nan))
+        m = blocks.shape[1] // 2 * 2
+        blocks = (blocks[:, :m:2] + blocks[:, 1:m:2]) / 2
+    errs = np.stack(errs, axis=-1)
+    block_size = 2 ** np.arange(errs.shape[-1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = errs / errs[:, :1]
+        # smallest block size past the correlation time (Lee et al. 2011)
+        plateau = block_size ** 3 > 2 * n_steps[:, None] * ratio ** 4
+    # without a plateau the largest blocks still underestimate the error
+    found = plateau.any(axis=-1)
+    level = plateau.argmax(axis=-1)
+    err = np.where(found, errs[np.arange(len(errs)), level], np.nan)
+    tau = np.where(found, ratio[np.arange(len(errs)), level] ** 2 / 2, np.nan)
+    return (mean, err, tau) if x.ndim == 3 else (mean[0], err[0], tau[0])
+
+
+@memoize()
+def blocked_mean_err(dataset, index=(), min_blocks=16):
+    x = dataset[(slice(None), *index)] if index else dataset[:]
+    return reblock.__wrapped__(x, min_blocks)
+
+
+class BatchedEWM:
+    def __init__(
+        self, n, init=5, outlier=3, outlier_maxlen=3, max_alpha=0.999, decay_alpha=10
+    ):
+        self.step = 0
+        self._init = init
+        self._outlier = outlier
+        self._outlier_maxlen = outlier_maxlen
+        self._max_alpha = max_alpha
+        self._decay_alpha = decay_alpha
+        self.mean = np.full(n, np.nan)
+        self.var = np.zeros(n)
+        self.sqerr = np.zeros(n)
+        self.n_outlier = np.zeros(n, dtype=int)
+
+    @property
+    def alpha(self):
+        return min(self._max_alpha, 1 - 1 / (2 + self.step / self._decay_alpha))
+
+    @property
+    def err(self):
+        return np.sqrt(self.sqerr)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.step == 0:
+            self.mean = x.copy()
+            self.step += 1
+            return np.zeros_like(x, dtype=bool)
+        a = self.alpha
+        if self.step >= self._init:
+            with np.errstate(invalid='ignore'):
+                is_outlier = np.abs(x - self.mean) > self._outlier * np.sqrt(self.var)
+            is_outlier &= self.n_outlier <= self._outlier_maxlen
+        else:
+            is_outlier = np.zeros_like(x, dtype=bool)
+        update = ~(is_outlier | np.isnan(x))
+        var = (1 - a) * (x - self.mean) ** 2 + a * self.var
+        sqerr = (1 - a) ** 2 * self.var + a ** 2 * self.sqerr
+        self.mean = np.where(update, (1 - a) * x + a * self.mean, self.mean)
+        self.var = np.where(update, var, self.var)
+        self.sqerr = np.where(update, sqerr, self.sqerr)
+        self.n_outlier = np.where(is_outlier, self.n_outlier + 1, 0)
+        self.step += 1
+        return is_outlier
+
+
+@memoize()
+def ewm_trajectory(x, **kwargs):
+    x = np.asarray(x, dtype=float)
+    x2d = np.atleast_2d(x)
+    ewm = BatchedEWM(len(x2d), **kwargs)
+    mean, err = np.empty_like(x2d), np.empty_like(x2d)
+    for step in range(x2d.shape[1]):
+        ewm.update(x2d[:, step])
+        mean[:, step], err[:, step] = ewm.mean, ewm.err
+    return (mean[0], err[0]) if x.ndim == 1 else (mean, err)
+
+
+def filter_outliers(x, q=2, axis=-1):
+    x = np.asarray(x, dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        l, m, h = np.nanquantile(x, [0.25, 0.5, 0.75], axis=axis, keepdims=True)
+    with np.errstate(invalid='ignore'):
+        return np.where(np.abs(x - m) < q * (h - l), x, np.nan)
@@ -0,0 +1,90 @@
+import hashlib
+import importlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BASELINE_NAME = 'baseline.pyscf'
+
+
+def molecule_from_system(system):
+    if isinstance(system, str):
+        name, system = system, {}
+    else:
+        system = dict(system)
+        name = system.pop('name')
+    if ':' in name:
+        module_name, qualname = name.split(':')
+        return getattr(importlib.import_module(module_name), qualname)(**system)
+    from deepqmc.molecule import Molecule
+
+    return Molecule.from_name(name, **system)
+
+
+def baseline_spec(params):
+    model_kwargs = params.get('model_kwargs', {})
+    mol = molecule_from_system(params['system'])
+    return {
+        'coords': mol.coords.cpu().numpy().astype(float).tolist(),
+        'charges': mol.charges.cpu().numpy().astype(float).tolist(),
+        'charge': mol.charge,
+        'spin': mol.spin,
+        'basis': model_kwargs.get('basis', '6-311g'),
+        'cas': model_kwargs.get('cas'),
+    }
+
+
+def baseline_key(spec):
+    payload = json.dumps(spec, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def compute_baseline(spec, path):
+    from pyscf import gto, lib, mcscf, scf
+
+    mol = gto.M(
+        atom=[(str(int(z)), xyz) for z, xyz in zip(spec['charges'], spec['coords'])],
+        unit='bohr',
+        basis=spec['basis'],
+        charge=spec['charge'],
+        spin=spec['spin'],
+        cart=True,
+        verbose=0,
+    )
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}')
+    mf = scf.RHF(mol)
+    mf.chkfile = str(tmp)
+    mf.kernel()
+    if spec['cas']:
+        mc = mcscf.CASSCF(mf, *spec['cas'])
+        mc.kernel()
+        lib.chkfile.dump(mc.chkfile, 'ci', mc.ci)
+        lib.chkfile.dump(mc.chkfile, 'nelecas', mc.nelecas)
+    tmp.replace(path)
+    return path
+
+
+class BaselineCache:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, key):
+        return self.root / key[:2] / f'{key}.pyscf'
+
+    def ensure(self, param_sets, workers=None):
+        specs = {}
+        keys = []
+        for params in param_sets:
+            spec = baseline_spec(params)
+            key = baseline_key(spec)
+            specs[key] = spec
+            keys.append(key)
+        missing = [key for key in specs if not self.path(key).exists()]
+        for key in missing:
+            self.path(key).parent.mkdir(parents=True, exist_ok=True)
+        if missing:
+            with ProcessPoolExecutor(workers) as executor:
+                paths = [self.path(key) for key in missing]
+                list(executor.map(compute_baseline, (specs[k] for k in missing), paths))
+        return keys
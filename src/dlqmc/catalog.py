@@ -0,0 +1,258 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import toml
+
+CATALOG_NAME = 'catalog.sqlite'
+STOP_NAME = 'stopped.toml'
+DEFAULT_BLOCK_SIZE = 10
+DEFAULT_SAMPLE_STEPS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    param_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_param_hash ON runs (param_hash);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (run_id, key)
+);
+CREATE INDEX IF NOT EXISTS params_key_value ON params (key, value);
+CREATE TABLE IF NOT EXISTS chkpts (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (run_id, step)
+);
+"""
+
+
+def flatten_params(params, prefix=''):
+    flat = {}
+    for key, val in params.items():
+        if isinstance(val, dict):
+            flat.update(flatten_params(val, f'{prefix}{key}.'))
+        elif val is not None:
+            flat[f'{prefix}{key}'] = val
+    return flat
+
+
+def param_hash(params):
+    flat = flatten_params(params)
+    flat.pop('baseline', None)  # derived from the other parameters
+    payload = json.dumps(flat, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def parse_where(items):
+    where = {}
+    for item in items:
+        key, val = item.split('=', 1)
+        try:
+            where[key] = toml.loads(f'x = {val}')['x']
+        except toml.TomlDecodeError:
+            where[key] = val
+    return where
+
+
+def chkpt_step(path):
+    return int(Path(path).stem.split('-')[1])
+
+
+def guess_kind(path):
+    if (path / 'state.pt').exists() and not (path / 'chkpts').exists():
+        return 'sample'
+    return 'train'
+
+
+def block_size(params):
+    sample_kwargs = params.get('evaluate_kwargs', {}).get('sample_kwargs', {})
+    return sample_kwargs.get('block_size', DEFAULT_BLOCK_SIZE)
+
+
+def _sample_status(path):
+    import h5py
+
+    params = toml.loads((path / 'param.toml').read_text())
+    n_steps = params.get('evaluate_kwargs', {}).get('n_steps', DEFAULT_SAMPLE_STEPS)
+    # deepqmc evaluate appends every full block to sample.h5 while it runs
+    try:
+        with h5py.File(path / 'sample.h5', 'r', swmr=True) as f:
+            n_blocks = len(f['blocks/energy']) if 'blocks/energy' in f else 0
+    except OSError:
+        return 'sampling'
+    return 'sampled' if n_blocks >= n_steps // block_size(params) else 'sampling'
+
+
+def run_status(path, kind, n_steps=10_000):
+    if (path / STOP_NAME).exists():
+        return 'stopped'
+    if kind == 'sample':
+        if (path / 'blocks.h5').exists():
+            return 'sampled'
+        if (path / 'sample.h5').exists():
+            return _sample_status(path)
+        return 'prepared'
+    if not (path / 'fit.h5').exists():
+        return 'prepared'
+    if (path / f'chkpts/state-{n_steps:05d}.pt').exists():
+        return 'trained'
+    return 'training'
+
+
+class Catalog:
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self.db = sqlite3.connect(str(self.root / CATALOG_NAME), timeout=60)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def find(cls, path, create=False):
+        path = Path(path).resolve()
+        for parent in [path, *path.parents]:
+            if (parent / CATALOG_NAME).exists():
+                return cls(parent)
+        if create:
+            path.mkdir(parents=True, exist_ok=True)
+            return cls(path)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def rel(self, path):
+        return Path(path).resolve().relative_to(self.root).as_posix()
+
+    def has_run(self, path):
+        row = self.db.execute('SELECT 1 FROM runs WHERE path = ?', (self.rel(path),))
+        return row.fetchone() is not None
+
+    def add_runs(self, runs, kind='train', status='prepared'):
+        now = time.time()
+        with self.db:
+            for path, params in runs:
+                self.db.execute('DELETE FROM runs WHERE path = ?', (self.rel(path),))
+                cur = self.db.execute(
+                    'INSERT INTO runs (path, param_hash, kind, status, updated)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (self.rel(path), param_hash(params), kind, status, now),
+                )
+                self.db.executemany(
+                    'INSERT INTO params (run_id, key, value) VALUES (?, ?, ?)',
+                    (
+                        (cur.lastrowid, key, json.dumps(val))
+                        for key, val in flatten_params(params).items()
+                    ),
+                )
+
+    def add_run(self, path, params, kind='train', status='prepared'):
+        self.add_runs([(path, params)], kind, status)
+
+    def set_status(self, path, status):
+        with self.db:
+            self.db.execute(
+                'UPDATE runs SET status = ?, updated = ? WHERE path = ?',
+                (status, time.time(), self.rel(path)),
+            )
+
+    def _select(
+        self, columns, where=None, kind=None, status=None, under=None, extra=''
+    ):
+        clauses, args = [], []
+        if under is not None and self.rel(under) != '.':
+            clauses.append('(r.path = ? OR r.path LIKE ?)')
+            args.extend([self.rel(under), self.rel(under) + '/%'])
+        for key, val in (where or {}).items():
+            clauses.append(
+                'r.id IN (SELECT run_id FROM params WHERE key = ? AND value = ?)'
+            )
+            args.extend([key, json.dumps(val)])
+        if kind:
+            clauses.append('r.kind = ?')
+            args.append(kind)
+        if status:
+            clauses.append('r.status = ?')
+            args.append(status)
+        sql = f'SELECT {columns} FROM runs r {extra}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return self.db.execute(sql + ' ORDER BY r.path', args)
+
+    def param_hashes(self, kind=None, under=None):
+        rows = self._select('r.param_hash, r.path', kind=kind, under=under)
+        return {param_hash: self.root / path for param_hash, path in rows}
+
+    def runs(self, where=None, kind=None, status=None, under=None):
+        rows = self._select('r.path, r.status', where, kind, status, under)
+        return [(self.root / path, status) for path, status in rows]
+
+    def params(self, path):
+        rows = self.db.execute(
+            'SELECT key, value FROM params JOIN runs ON run_id = id WHERE path = ?',
+            (self.rel(path),),
+        )
+        return {key: json.loads(val) for key, val in rows}
+
+    def latest_chkpts(self, where=None, kind='train', under=None):
+        rows = self._select(
+            'r.path, c.step, c.path',
+            where,
+            kind,
+            under=under,
+            extra='JOIN chkpts c ON c.run_id = r.id AND c.step = '
+            '(SELECT MAX(step) FROM chkpts WHERE run_id = r.id)',
+        )
+        return [
+            (self.root / path, step, self.root / chkpt) for path, step, chkpt in rows
+        ]
+
+    def refresh(self, discover=True):
+        if discover:
+            known = {path for path, _ in self.runs()}
+            new = defaultdict(list)
+            for p in sorted(self.root.glob('**/param.toml')):
+                if p.parent.resolve() not in known:
+                    params = toml.loads(p.read_text())
+                    new[guess_kind(p.parent)].append((p.parent, params))
+            for kind, runs in new.items():
+                self.add_runs(runs, kind)
+        rows = self.db.execute(
+            'SELECT id, path, kind, value FROM runs LEFT JOIN params'
+            " ON run_id = id AND key = 'train_kwargs.n_steps'"
+        ).fetchall()
+        now = time.time()
+        with self.db:
+            for run_id, path, kind, n_steps in rows:
+                path = self.root / path
+                chkpts = [
+                    (run_id, chkpt_step(p), self.rel(p))
+                    for p in (path / 'chkpts').glob('state-*.pt')
+                ]
+                self.db.execute('DELETE FROM chkpts WHERE run_id = ?', (run_id,))
+                self.db.executemany(
+                    'INSERT INTO chkpts (run_id, step, path) VALUES (?, ?, ?)', chkpts
+                )
+                n_steps = json.loads(n_steps) if n_steps else 10_000
+                status = run_status(path, kind, n_steps)
+                self.db.execute(
+                    'UPDATE runs SET status = ?, updated = ? WHERE id = ?',
+                    (status, now, run_id),
+                )
@@ -0,0 +1,179 @@
+import hashlib
+import inspect
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import toml
+
+from .catalog import chkpt_step, param_hash
+from .summary import find_all_runs, read_fit_energy
+
+
+def sidecar_path(chkpt):
+    return Path(chkpt).with_suffix('.json')
+
+
+def content_hash(path, chunk_size=2 ** 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# buffers registered by the deepqmc wave functions, stored next to the parameters
+# in their state dicts
+WF_BUFFERS = {
+    'anorms',
+    'basis_cusp_info',
+    'centers',
+    'charges',
+    'coeffs',
+    'confs',
+    'coords',
+    'mus',
+    'nuclei_idxs',
+    'rc',
+    'sigmas',
+    'spin_idxs',
+    'zetas',
+}
+
+
+def count_params(chkpt):
+    import torch
+
+    kwargs = {}
+    # our own training states, these also pickle the EWM monitor
+    if 'weights_only' in inspect.signature(torch.load).parameters:
+        kwargs['weights_only'] = False
+    state = torch.load(chkpt, map_location='cpu', **kwargs)
+    return sum(
+        int(x.numel())
+        for key, x in state['wf'].items()
+        if key.rsplit('.', 1)[-1] not in WF_BUFFERS and x.is_floating_point()
+    )
+
+
+def read_sidecar(chkpt):
+    path = sidecar_path(chkpt)
+    if not path.exists():
+        return None
+    sidecar = json.loads(path.read_text())
+    st = Path(chkpt).stat()
+    if (sidecar['size'], sidecar['mtime']) != (st.st_size, st.st_mtime_ns):
+        return None
+    return sidecar
+
+
+def _write_sidecar(chkpt, sidecar):
+    path = sidecar_path(chkpt)
+    tmp = path.with_name(f'.{path.name}.tmp')
+    tmp.write_text(json.dumps(sidecar, indent=2))
+    tmp.replace(path)
+
+
+def _ewm_at_steps(run, steps):
+    from .analysis import ewm_trajectory
+
+    if not (run / 'fit.h5').exists():
+        return [(None, None) for _ in steps]
+    try:
+        E_mean = read_fit_energy(run)
+    except (KeyError, OSError) as e:
+        print(f'{run}: indexed without energies, cannot read fit.h5 ({e})')
+        return [(None, None) for _ in steps]
+    if not len(E_mean):
+        return [(None, None) for _ in steps]
+    E_ewm, E_err = ewm_trajectory(E_mean)
+    # a checkpoint at step n is written after n training steps
+    idxs = np.clip(np.array(steps) - 1, 0, len(E_mean) - 1)
+    return [
+        (float(E_ewm[i]), float(E_err[i])) if np.isfinite(E_ewm[i]) else (None, None)
+        for i in idxs
+    ]
+
+
+def index_run(run, force=False):
+    run = Path(run)
+    chkpts = sorted((run / 'chkpts').glob('state-*.pt'), key=chkpt_step)
+    sidecars = {p: None if force else read_sidecar(p) for p in chkpts}
+    todo = [p for p, sidecar in sidecars.items() if sidecar is None]
+    if not todo:
+        return sidecars
+    h = param_hash(toml.loads((run / 'param.toml').read_text()))
+    energies = _ewm_at_steps(run, [chkpt_step(p) for p in todo])
+    for chkpt, (energy, err) in zip(todo, energies):
+        st = chkpt.stat()
+        sidecars[chkpt] = {
+            'step': chkpt_step(chkpt),
+            'param_hash': h,
+            'n_params': count_params(chkpt),
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'sha256': content_hash(chkpt),
+            'energy_ewm': energy,
+            'energy_ewm_err': err,
+        }
+        _write_sidecar(chkpt, sidecars[chkpt])
+    return sidecars
+
+
+def _index_run(run, force):
+    return {str(p): sidecar for p, sidecar in index_run(run, force).items()}
+
+
+def index_tree(tree, force=False, workers=None):
+    runs = [path for path, kind in find_all_runs(tree) if kind == 'train']
+    sidecars = {}
+    with ProcessPoolExecutor(workers) as executor:
+        for indexed in executor.map(_index_run, runs, [force] * len(runs)):
+            sidecars.update((Path(p), sidecar) for p, sidecar in indexed.items())
+    return sidecars
+
+
+def dedup(sidecars):
+    groups = defaultdict(list)
+    for chkpt, sidecar in sidecars.items():
+        groups[sidecar['sha256'], sidecar['size']].append(chkpt)
+    saved = 0
+    for (_, size), chkpts in groups.items():
+        first, *others = chkpts
+        st_first = first.stat()
+        for chkpt in others:
+            st = chkpt.stat()
+            if st.st_ino == st_first.st_ino or st.st_dev != st_first.st_dev:
+                continue
+            tmp = chkpt.with_name(f'.{chkpt.name}.tmp')
+            if tmp.exists():
+                tmp.unlink()
+            os.link(first, tmp)
+            tmp.replace(chkpt)
+            # the link shares the inode and modification time of the first copy
+            sidecar = {**sidecars[chkpt], 'mtime': st_first.st_mtime_ns}
+            _write_sidecar(chkpt, sidecar)
+            sidecars[chkpt] = sidecar
+            saved += size
+    return saved
+
+
+def select_chkpts(run, policy='latest', every=None):
+    chkpts = sorted((Path(run) / 'chkpts').glob('state-*.pt'), key=chkpt_step)
+    if not chkpts:
+        return []
+    if policy == 'latest':
+        return [chkpts[-1]]
+    if policy == 'every':
+        return [p for p in chkpts if chkpt_step(p) % every == 0]
+    assert policy == 'best-ewm'
+    sidecars = index_run(run)
+    scored = [
+        (sidecar['energy_ewm'], chkpt_step(p), p)
+        for p, sidecar in sidecars.items()
+        if sidecar['energy_ewm'] is not None
+    ]
+    return [min(scored)[2]] if scored else []
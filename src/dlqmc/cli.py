@@ -1,24 +1,327 @@
+import importlib
+import os
+import sys
 from pathlib import Path
 
 import click
 
-from . import experiments
+from . import runner
+from .baseline import BaselineCache
+from .catalog import Catalog, parse_where
+
+# prepare subcommands are imported only when invoked, keep in sync with experiments
+PREPARE_COMMANDS = {
+    'all-systems': (
+        'dlqmc.experiments:all_systems',
+        'Small systems with single and multiple determinants.',
+    ),
+    'boron': ('dlqmc.experiments:boron', 'Ansatz and training variants for boron.'),
+    'custom': ('dlqmc.experiments:custom', 'Single run from a parameter file.'),
+    'cyclobutadiene': (
+        'dlqmc.experiments:cyclobutadiene',
+        'Ground and transition states of cyclobutadiene.',
+    ),
+    'hyperparam-scan-co2': (
+        'dlqmc.experiments:hyperparam_scan_co2',
+        'Grid of training hyperparameters for CO2.',
+    ),
+    'sampling': (
+        'dlqmc.experiments:sampling',
+        'Sampling runs from checkpoints of a training tree.',
+    ),
+    'sampling-states': (
+        'dlqmc.experiments:sampling_states',
+        'Sampling runs from state files.',
+    ),
+    'scan': ('dlqmc.experiments:scan', 'Runs along a geometry scan of a Z-matrix.'),
+    'script': ('dlqmc.experiments:script', 'Run directory with a copy of a script.'),
+    'sweep': ('dlqmc.experiments:sweep', 'Runs of a parameter sweep from a TOML file.'),
+}
+
+
+class LazyGroup(click.Group):
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx, name):
+        if name not in self.commands and name in self.lazy_commands:
+            target, help = self.lazy_commands[name]
+            module_name, attr = target.split(':')
+            cmd = getattr(importlib.import_module(module_name), attr)
+            cmd.help = cmd.help or help
+            self.add_command(cmd, name)
+        return super().get_command(ctx, name)
+
+    def format_commands(self, ctx, formatter):
+        # listing the commands must not import them
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.commands:
+                help = self.commands[name].get_short_help_str()
+            else:
+                help = self.lazy_commands[name][1]
+            rows.append((name, help))
+        with formatter.section('Commands'):
+            formatter.write_dl(rows)
 
 
 @click.group()
-def cli():
-    pass
+@click.option(
+    '--profile',
+    type=click.Path(dir_okay=False),
+    envvar='DLQMC_PROFILE',
+    help='Write a Chrome trace of timings, file reads and memory to this file.',
+)
+@click.pass_context
+def cli(ctx, profile):
+    if profile:
+        from . import profiling
+
+        profiling.enable(profile)
+        ctx.call_on_close(lambda: profiling.finish(f'dlqmc {ctx.invoked_subcommand}'))
 
 
-@cli.group()
+@cli.group(cls=LazyGroup, lazy_commands=PREPARE_COMMANDS)
 @click.argument('path')
+@click.option(
+    '--baseline-cache',
+    type=click.Path(file_okay=False),
+    help='Compute PySCF baselines once per system into this directory.',
+)
 @click.pass_context
-def prepare(ctx, path):
+def prepare(ctx, path, baseline_cache):
     ctx.ensure_object(dict)
     ctx.obj['basedir'] = Path(path)
+    if baseline_cache:
+        ctx.obj['baseline_cache'] = BaselineCache(baseline_cache)
+    ctx.obj['catalog'] = Catalog.find(path)
+    if ctx.obj['catalog']:
+        ctx.call_on_close(ctx.obj['catalog'].close)
+
+
+@cli.command()
+@click.argument('basedir', type=click.Path(exists=True, file_okay=False))
+@click.option('-j', '--jobs', type=int, help='Number of reader processes.')
+@click.option('--no-cache', is_flag=True, help='Ignore and do not update the cache.')
+@click.option('-o', '--output', type=click.Path(), help='Write results as CSV.')
+def collect(basedir, jobs, no_cache, output):
+    from .experiments import collect_all_systems
+    from .tools import short_fmt
+    from .uarray import UArray
+
+    results = collect_all_systems(basedir, workers=jobs, cache=not no_cache)
+    if output:
+        results.to_csv(output)
+    else:
+        energy = short_fmt(UArray(results['energy'], results['err']))
+        click.echo(results[[]].assign(energy=energy).to_string())
+
+
+@cli.command()
+@click.argument(
+    'trees', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False)
+)
+@click.option('-v', '--verbose', is_flag=True, help='Print consolidated files.')
+def consolidate(trees, verbose):
+    from .store import STORE_NAME, consolidate_tree
+
+    for tree in trees:
+        n_files = 0
+        for key in consolidate_tree(tree):
+            n_files += 1
+            if verbose:
+                click.echo(key)
+        click.echo(f'{Path(tree) / STORE_NAME}: {n_files} files added or updated')
+
+
+@cli.command()
+@click.argument(
+    'trees', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False)
+)
+@click.option('-n', '--points', default=200, show_default=True, help='EWM points.')
+@click.option('--start', default=100, show_default=True, help='Start of the fit.')
+@click.option('-j', '--jobs', type=int, help='Number of worker processes.')
+@click.option('-f', '--force', is_flag=True, help='Rewrite up-to-date summaries.')
+def summarize(trees, points, start, jobs, force):
+    from .summary import summarize_tree
+
+    for tree in trees:
+        outs = summarize_tree(tree, points, start, force, jobs)
+        click.echo(f'{tree}: {len(outs)} summaries written')
+
+
+@cli.command()
+@click.argument('stages', nargs=-1)
+@click.option('--root', default='.', type=click.Path(exists=True, file_okay=False))
+@click.option('-j', '--jobs', type=int, help='Number of worker processes.')
+@click.option('-f', '--force', is_flag=True, help='Rebuild up-to-date stages.')
+@click.option(
+    '--check-files',
+    is_flag=True,
+    envvar='DLQMC_CHECK_FILES',
+    help='Compare every file against the store of dlqmc consolidate.',
+)
+def process(stages, root, jobs, force, check_files):
+    from . import pipeline
+
+    if check_files:
+        # inherited by the stage workers
+        os.environ['DLQMC_CHECK_FILES'] = '1'
+
+    unknown = set(stages) - set(pipeline.STAGES)
+    if unknown:
+        raise click.BadParameter(
+            f'Unknown stages {sorted(unknown)}, choose from {list(pipeline.STAGES)}',
+            param_hint='STAGES',
+        )
+    for name, built in pipeline.run_pipeline(root, stages, force, jobs):
+        click.echo(f'{name}: {"built" if built else "up to date"}')
+
+
+@cli.command('index-chkpts')
+@click.argument(
+    'trees', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False)
+)
+@click.option('-j', '--jobs', type=int, help='Number of worker processes.')
+@click.option('-f', '--force', is_flag=True, help='Rewrite up-to-date sidecars.')
+@click.option('--dedup', is_flag=True, help='Hardlink checkpoints of equal content.')
+def index_chkpts(trees, jobs, force, dedup):
+    from . import chkpts
+
+    sidecars = {}
+    for tree in trees:
+        indexed = chkpts.index_tree(tree, force, jobs)
+        click.echo(f'{tree}: {len(indexed)} checkpoints indexed')
+        sidecars.update(indexed)
+    if dedup:
+        saved = chkpts.dedup(sidecars)
+        click.echo(f'{saved / 2 ** 20:.1f} MiB freed by hardlinking')
+
+
+@cli.command()
+@click.argument('names', nargs=-1)
+@click.option('--root', default='.', type=click.Path(exists=True, file_okay=False))
+@click.option('-o', '--output', type=click.Path(), help='Output directory [pub/figs].')
+@click.option('--ext', default='pdf', show_default=True, help='File format.')
+@click.option('-j', '--jobs', type=int, help='Number of worker processes.')
+@click.option('-f', '--force', is_flag=True, help='Render up-to-date figures.')
+def figures(names, root, output, ext, jobs, force):
+    from . import figures
+
+    unknown = set(names) - set(figures.FIGURES)
+    if unknown:
+        raise click.BadParameter(
+            f'Unknown figures {sorted(unknown)}, choose from {list(figures.FIGURES)}',
+            param_hint='NAMES',
+        )
+    failed = []
+    for name, status in figures.render_figures(root, names, output, ext, force, jobs):
+        click.echo(f'{name}: {status}')
+        if status.startswith('failed'):
+            failed.append(name)
+    if failed:
+        raise click.ClickException(f'Figures not rendered: {", ".join(failed)}')
+
+
+@cli.command()
+@click.argument('root', type=click.Path(file_okay=False))
+@click.option(
+    '--kind',
+    type=click.Choice(['blocks', 'sample', 'train', 'pub']),
+    default='blocks',
+    show_default=True,
+    help='Run tree of blocks.h5, sample.h5 or fit.h5 files, or data/raw files.',
+)
+@click.option('--systems', default=4, show_default=True, help='Systems in the tree.')
+@click.option('--ansatzes', default=4, show_default=True, help='Runs per system.')
+@click.option('--blocks', default=100, show_default=True, help='Sampled blocks.')
+@click.option('--walkers', default=100, show_default=True, help='Sampled walkers.')
+@click.option('--steps', default=1000, show_default=True, help='Training steps.')
+@click.option('--batch-size', default=100, show_default=True, help='Training batch.')
+@click.option('--seed', default=0, show_default=True)
+def synthesize(root, kind, systems, ansatzes, blocks, walkers, steps, batch_size, seed):
+    from . import synthetic
+
+    if kind == 'pub':
+        synthetic.write_pub_files(root, blocks, walkers, steps, batch_size, seed)
+        synthetic.write_cyclobutadiene(
+            root, n_steps=steps, n_blocks=blocks, n_walkers=walkers, seed=seed
+        )
+        return
+    synthetic.write_run_tree(
+        root, systems, ansatzes, blocks, walkers, steps, batch_size, kind, seed
+    )
+
+
+@cli.command()
+@click.argument('tree', type=click.Path(exists=True, file_okay=False))
+@click.option('-c', '--cores', type=int, help='Number of cores to fill.')
+@click.option('-t', '--threads', default=1, show_default=True, help='Threads per run.')
+@click.option(
+    '--command',
+    default=runner.DEFAULT_COMMAND,
+    show_default=True,
+    help='Command template filled with {action} and {path}.',
+)
+@click.option(
+    '--lease-ttl',
+    default=600.0,
+    show_default=True,
+    help='Seconds after which leases of dead workers expire.',
+)
+@click.option('--wait', is_flag=True, help='Keep waiting for runs leased elsewhere.')
+def run(tree, cores, threads, command, lease_ttl, wait):
+    cores = cores or len(os.sched_getaffinity(0))
+    executor = runner.Executor(
+        tree, max(1, cores // threads), threads, command, lease_ttl, wait
+    )
+    if executor.run():
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('basedir', type=click.Path(exists=True, file_okay=False))
+@click.option('-n', '--interval', default=10.0, show_default=True)
+@click.option('--start', default=100, show_default=True, help='First fitted step.')
+@click.option('-j', '--jobs', default=8, show_default=True, help='Polling threads.')
+@click.option('--once', is_flag=True, help='Print the table once and exit.')
+def watch(basedir, interval, start, jobs, once):
+    from . import monitor
+
+    monitor.watch_runs(basedir, interval, start, jobs, once=once)
+
+
+@cli.command()
+@click.argument('tree', type=click.Path(exists=True, file_okay=False))
+@click.option('--eta', default=3, show_default=True, help='Reduction factor.')
+@click.option('--min-steps', default=250, show_default=True, help='First rung.')
+@click.option('--start', default=100, show_default=True, help='Start of the fit.')
+@click.option('-n', '--interval', default=60.0, show_default=True)
+@click.option('--once', is_flag=True, help='Check once and exit.')
+def halve(tree, eta, min_steps, start, interval, once):
+    from . import halving
+
+    halving.halve_runs(tree, eta, min_steps, start, interval, once)
 
 
-for attr in dir(experiments):
-    obj = getattr(experiments, attr)
-    if isinstance(obj, click.core.Command):
-        prepare.add_command(obj)
+@cli.command('catalog')
+@click.argument('path', type=click.Path(exists=True, file_okay=False))
+@click.option('--refresh', is_flag=True, help='Index new runs and checkpoints.')
+@click.option('-w', '--where', multiple=True, help='Select runs by KEY=VALUE.')
+@click.option('--status', help='Select runs by status.')
+def catalog_(path, refresh, where, status):
+    catalog = Catalog.find(path, create=refresh)
+    if not catalog:
+        raise click.ClickException(f'No run catalog found for {path}')
+    with catalog:
+        if refresh:
+            catalog.refresh()
+        chkpts = {p: step for p, step, _ in catalog.latest_chkpts(under=path)}
+        runs = catalog.runs(parse_where(where), None, status, path)
+        for run_path, run_status in runs:
+            step = chkpts.get(run_path, '')
+            click.echo(f'{catalog.rel(run_path)}\t{run_status}\t{step}')
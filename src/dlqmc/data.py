@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather
+except ImportError:
+    pa = None
+
+FINAL_DIR = 'data/final'
+
+
+def find_root(path=None):
+    path = Path(path or '.').resolve()
+    for parent in [path, *path.parents]:
+        if (parent / FINAL_DIR).is_dir():
+            return parent
+    raise FileNotFoundError(f'No {FINAL_DIR} directory above {path}')
+
+
+def compact_frame(df):
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype('category')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def write_columnar(df, path):
+    if pa is None:
+        return False
+    tmp = Path(path).with_suffix('.tmp')
+    pyarrow.feather.write_feather(compact_frame(df), tmp, compression='uncompressed')
+    tmp.replace(path)
+    return True
+
+
+def open_table(name, root=None):
+    path = find_root(root) / FINAL_DIR / f'{name}.arrow'
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def load(name, columns=None, root=None):
+    root = find_root(root)
+    if pa is not None and (root / FINAL_DIR / f'{name}.arrow').exists():
+        table = open_table(name, root)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table.to_pandas(split_blocks=True)
+    return pd.read_csv(root / FINAL_DIR / f'{name}.csv', usecols=columns)
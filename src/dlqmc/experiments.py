@@ -1,16 +1,103 @@
+import json
 import os
 import shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from itertools import chain, product
 from pathlib import Path
 
 import click
-import numpy as np
-import pandas as pd
-import tables
 import toml
-from uncertainties import ufloat
 
-from deepqmc.utils import NestedDict
+from .baseline import BASELINE_NAME
+from .catalog import Catalog, chkpt_step, flatten_params, param_hash, parse_where
+from .profiling import span
+from .tools import NestedDict
+
+
+def _catalog(ctx):
+    if ctx.obj.get('catalog') is None:
+        ctx.obj['catalog'] = Catalog.find(ctx.obj['basedir'], create=True)
+        ctx.call_on_close(ctx.obj['catalog'].close)
+    return ctx.obj['catalog']
+
+
+def _symlink(path, target):
+    target = os.path.relpath(Path(target).resolve(), path.parent.resolve())
+    path.symlink_to(Path(target))
+
+
+def _write_run(path, params, state=None, baseline=None):
+    path.mkdir(parents=True)
+    with span('toml.dumps'):
+        text = toml.dumps(params, encoder=toml.TomlEncoder())
+    (path / 'param.toml').write_text(text)
+    if state:
+        _symlink(path / 'state.pt', state)
+    if baseline:
+        _symlink(path / BASELINE_NAME, baseline)
+
+
+def _baselines(ctx, param_sets):
+    cache = ctx.obj.get('baseline_cache')
+    if not cache:
+        return [None for _ in param_sets]
+    keys = cache.ensure(param_sets)
+    for params, key in zip(param_sets, keys):
+        params['baseline'] = key
+    return [cache.path(key) for key in keys]
+
+
+def _prepare_run(ctx, path, params, state=None, kind='train'):
+    print(path)
+    (baseline,) = _baselines(ctx, [params])
+    _write_run(path, params, state, baseline)
+    _catalog(ctx).add_run(path, params, kind)
+
+
+def _existing_paths(paths):
+    existing = set()
+    for parent in {path.parent for path in paths}:
+        if parent.is_dir():
+            existing.update(parent / name for name in os.listdir(parent))
+    return existing
+
+
+def _prepare_runs(ctx, runs, kind='train', dedup=False):
+    catalog = ctx.obj.get('catalog')
+    seen = {}
+    if dedup and catalog:
+        seen = catalog.param_hashes(kind, under=ctx.obj['basedir'])
+    known = {path for path, _ in catalog.runs()} if catalog else set()
+    runs = list(runs)
+    with span('existing_paths'):
+        existing = _existing_paths([path for path, _ in runs])
+    todo = []
+    for path, params in runs:
+        if path.resolve() in known or path in existing:
+            continue
+        if dedup:
+            h = param_hash(params)
+            if h in seen:
+                print(f'{path}: same parameters as {seen[h]}, skipped')
+                continue
+            seen[h] = path
+        todo.append((path, params))
+    for path, _ in todo:
+        print(path)
+    baselines = _baselines(ctx, [params for _, params in todo])
+    with span('write_runs', runs=len(todo)), ThreadPoolExecutor(16) as executor:
+        list(
+            executor.map(
+                lambda run, baseline: _write_run(*run, baseline=baseline),
+                todo,
+                baselines,
+            )
+        )
+    if todo:
+        with span('catalog.add_runs'):
+            _catalog(ctx).add_runs(todo, kind)
+    return todo
 
 
 @click.command()
@@ -22,8 +109,10 @@ def custom(ctx, param):
     path.mkdir(parents=True)
     param = Path(param)
     shutil.copy(param, path)
-    if toml.loads(param.read_text()).get('hooks'):
+    params = toml.loads(param.read_text())
+    if params.get('hooks'):
         shutil.copy(param.parent / 'hooks.py', path)
+    _catalog(ctx).add_run(path, params)
 
 
 @click.command()
@@ -48,36 +137,124 @@ def all_systems(ctx):
     ]
     cass = {'H2': [2, 2], 'B': [4, 3], 'LiH': [4, 2], 'Hn': [6, 4], 'Be': [4, 2]}
     param_sets = ['SD-SJ', 'SD-SJBF', 'MD-SJ', 'MD-SJBF']
+    runs = []
     for system, param_set in product(systems, param_sets):
         sys_name = system if isinstance(system, str) else system['name']
         sys_label = sys_name
         if sys_name == 'Hn':
             sys_label += f'-{system["dist"]}'
         path = ctx.obj['basedir'] / sys_label / param_set
-        if path.exists():
-            continue
-        print(path)
         params = NestedDict()
         params['system'] = system
         if 'MD' in param_set:
             params['model_kwargs.cas'] = cass[sys_name]
         if 'BF' not in param_set:
             params['model_kwargs.omni_kwargs.with_backflow'] = False
-        path.mkdir(parents=True)
-        (path / 'param.toml').write_text(toml.dumps(params, encoder=toml.TomlEncoder()))
+        runs.append((path, params))
+    _prepare_runs(ctx, runs)
 
 
-def collect_all_systems(basedir):
-    results = []
-    for path in Path(basedir).glob('**/blocks.h5'):
-        with tables.open_file(path) as f:
-            if 'blocks' not in f.root:
+def _energy_stats(blocks):
+    from .analysis import mean_err, reblock
+
+    ene, err = mean_err(blocks)
+    # NaN where the blocking analysis finds no plateau
+    _, err_blocked, tau = reblock(blocks)
+    return {
+        'energy': (float(ene), float(err)),
+        'err_blocked': float(err_blocked),
+        'tau': float(tau),
+    }
+
+
+def _blocks_energy(path):
+    import tables
+
+    with span('hdf5.read', path=str(path)), tables.open_file(path) as f:
+        if 'blocks' not in f.root:
+            return {'energy': None, 'err_blocked': None, 'tau': None}
+        blocks = f.root['blocks'].cols.energy[:]
+    with span('reblock'):
+        return _energy_stats(blocks)
+
+
+def _blocks_entries(basedir, paths, cached):
+    from .store import locate_results
+
+    name = 'blocks/energy'
+    store, paths, stored = locate_results(basedir, '**/blocks.h5', name, paths)
+    entries, todo = {}, []
+    try:
+        for path in sorted(paths):
+            key = str(path.relative_to(basedir))
+            if path in stored:
+                stat = store.stat(stored[path], name)
+            else:
+                st = path.stat()
+                stat = st.st_mtime_ns, st.st_size
+            entry = cached.get(key)
+            fresh = entry and (entry['mtime'], entry['size']) == stat
+            if fresh and 'err_blocked' in entry:
+                entries[key] = entry
                 continue
-            ene = f.root['blocks'].col('energy')
-            ene = ufloat(ene.mean(), ene.mean(0).std() / np.sqrt(ene.shape[-1]))
-            system, ansatz = str(path).split('/')[-3:-1]
-            results.append({'system': system, 'ansatz': ansatz, 'energy': ene})
-    results = pd.DataFrame(results).set_index(['system', 'ansatz'])
+            entries[key] = {'mtime': stat[0], 'size': stat[1]}
+            if path in stored:
+                blocks = store.read(stored[path], name)
+                entries[key].update(_energy_stats(blocks))
+            else:
+                todo.append(key)
+    finally:
+        if store:
+            store.close()
+    return entries, todo
+
+
+def collect_all_systems(basedir, workers=None, cache=True):
+    import pandas as pd
+
+    basedir = Path(basedir).resolve()
+    cache_path = basedir / '.collect-cache.json'
+    cached = json.loads(cache_path.read_text()) if cache and cache_path.exists() else {}
+    with span('find_runs'):
+        catalog = Catalog.find(basedir)
+        if catalog:
+            with catalog:
+                paths = [path / 'blocks.h5' for path, _ in catalog.runs(under=basedir)]
+            paths = [path for path in paths if path.exists()]
+        else:
+            paths = sorted(basedir.glob('**/blocks.h5'))
+    with span('stat_runs', runs=len(paths)):
+        entries, todo = _blocks_entries(basedir, paths, cached)
+    if todo:
+        paths = [basedir / key for key in todo]
+        with span('read_runs', runs=len(paths)), ProcessPoolExecutor(
+            workers
+        ) as executor:
+            stats = executor.map(_blocks_energy, paths, chunksize=16)
+            for key, entry in zip(todo, stats):
+                entries[key].update(entry)
+    if cache:
+        cache_tmp = cache_path.with_suffix('.tmp')
+        cache_tmp.write_text(json.dumps(entries))
+        cache_tmp.replace(cache_path)
+    results = []
+    for key, entry in entries.items():
+        if entry['energy'] is None:
+            continue
+        system, ansatz = str(basedir / key).split('/')[-3:-1]
+        ene, err = entry['energy']
+        results.append(
+            {
+                'system': system,
+                'ansatz': ansatz,
+                'energy': ene,
+                'err': err,
+                'err_blocked': entry['err_blocked'],
+                'tau': entry['tau'],
+            }
+        )
+    with span('frame'):
+        results = pd.DataFrame(results).set_index(['system', 'ansatz'])
     return results
 
 
@@ -89,12 +266,10 @@ def hyperparam_scan_co2(ctx):
     epoch_sizes = [3, 5, 8]
     ns_decorrelate = [5, 10, 20]
     payload = product(learning_rates, batch_sizes, epoch_sizes, ns_decorrelate)
+    runs = []
     for lr, bs, es, n_decorr in payload:
         label = f'lr-{lr}_bs-{bs}_es-{es}_decorr-{n_decorr}'
         path = ctx.obj['basedir'] / label
-        if path.exists():
-            continue
-        print(path)
         params = NestedDict()
         params['system'] = 'CO2'
         params['train_kwargs.n_steps'] = 2000
@@ -102,37 +277,126 @@ def hyperparam_scan_co2(ctx):
         params['train_kwargs.batch_size'] = bs
         params['train_kwargs.epoch_size'] = es
         params['train_kwargs.sampler_kwargs.n_decorrelate'] = n_decorr
-        path.mkdir(parents=True)
-        (path / 'param.toml').write_text(toml.dumps(params, encoder=toml.TomlEncoder()))
+        runs.append((path, params))
+    _prepare_runs(ctx, runs)
+
+
+def _train_runs(training, where):
+    runs = []
+    with span('glob', pattern='**/param.toml'):
+        param_paths = sorted(training.glob('**/param.toml'))
+    for param_path in param_paths:
+        with span('toml.loads'):
+            params = flatten_params(toml.loads(param_path.read_text()))
+        if all(params.get(key) == val for key, val in where.items()):
+            runs.append(param_path.parent)
+    return runs
+
+
+def _selected_chkpts(training, where, refresh, select, every):
+    from .chkpts import select_chkpts
+
+    catalog = Catalog.find(training)
+    if catalog:
+        with catalog:
+            if refresh:
+                catalog.refresh()
+            # checkpoints written since the last refresh are found on disk
+            runs = [
+                path for path, _ in catalog.runs(where, kind='train', under=training)
+            ]
+    else:
+        runs = _train_runs(training, where)
+    return [
+        (train_path, chkpt)
+        for train_path in runs
+        for chkpt in select_chkpts(train_path, select, every)
+    ]
+
+
+def _plan_options(func):
+    options = [
+        click.option(
+            '--target-err',
+            type=float,
+            help='Set sample lengths to reach this error (Ha), needs --pilot.',
+        ),
+        click.option(
+            '--pilot',
+            type=click.Path(exists=True, file_okay=False),
+            help='Tree of short sampling runs with the same layout.',
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def _check_plan(target_err, pilot):
+    if (target_err is None) != (pilot is None):
+        raise click.UsageError('--target-err and --pilot must be given together')
+
+
+def _planned(params, label, target_err, pilot):
+    if target_err is None:
+        return params
+    from .planning import plan_sampling
+
+    try:
+        plan = plan_sampling(Path(pilot) / label, params, target_err)
+    except (KeyError, OSError) as e:
+        click.echo(f'{label}: skipped, cannot read pilot run ({e})')
+        return None
+    click.echo(
+        f'{label}: pilot error {1e3 * plan["err"]:.3f} mHa, tau {plan["tau"]:.1f}, '
+        f'{plan["n_blocks"]} blocks needed'
+    )
+    if not plan['n_blocks']:
+        return None
+    params = NestedDict(params)
+    params['evaluate_kwargs.n_steps'] = plan['n_steps']
+    return params
 
 
 @click.command()
 @click.argument('training', type=click.Path(exists=True))
+@click.option('-w', '--where', multiple=True, help='Select runs by KEY=VALUE.')
+@click.option('--refresh', is_flag=True, help='Refresh the run catalog first.')
+@click.option(
+    '--select',
+    type=click.Choice(['latest', 'best-ewm', 'every']),
+    default='latest',
+    show_default=True,
+    help='Checkpoints to sample, best-ewm uses the sidecars of dlqmc index-chkpts.',
+)
+@click.option(
+    '--every', default=1000, show_default=True, help='Step interval for --select every.'
+)
+@_plan_options
 @click.pass_context
-def sampling(ctx, training):
-    for param_path in Path(training).glob('**/param.toml'):
-        train_path = param_path.parent
+def sampling(ctx, training, where, refresh, select, every, target_err, pilot):
+    _check_plan(target_err, pilot)
+    training = Path(training).resolve()
+    where = parse_where(where)
+    chkpts = _selected_chkpts(training, where, refresh, select, every)
+    for train_path, chkpt in chkpts:
         label = train_path.relative_to(training)
-        chkpts = [
-            p.stem.split('-')[1] for p in (train_path / 'chkpts').glob('state-*.pt')
-        ]
-        if not chkpts:
-            continue
-        step = max(chkpts)
-        path = ctx.obj['basedir'] / label
-        print(path)
+        if select == 'every':
+            label = label / f'chkpt-{chkpt_step(chkpt)}'
         params = toml.loads((train_path / 'param.toml').read_text())
-        train_path = Path(os.path.relpath(train_path.resolve(), path.resolve()))
-        path.mkdir(parents=True)
-        (path / 'param.toml').write_text(toml.dumps(params, encoder=toml.TomlEncoder()))
-        (path / 'state.pt').symlink_to(train_path / f'chkpts/state-{step}.pt')
+        params = _planned(params, label, target_err, pilot)
+        if params:
+            path = ctx.obj['basedir'] / label
+            _prepare_run(ctx, path, params, state=chkpt, kind='sample')
 
 
 @click.command()
 @click.argument('state', type=click.Path(exists=True), nargs=-1)
 @click.option('--param')
+@_plan_options
 @click.pass_context
-def sampling_states(ctx, state, param):
+def sampling_states(ctx, state, param, target_err, pilot):
+    _check_plan(target_err, pilot)
     base = os.path.commonpath(state)
     if param:
         param = toml.loads(Path(param).read_text())
@@ -141,23 +405,21 @@ def sampling_states(ctx, state, param):
         train_path = Path(state_path).parents[1]
         params = NestedDict()
         path = ctx.obj['basedir'] / label
-        print(path)
         params_train = toml.loads((train_path / 'param.toml').read_text())
         params.update(params_train)
         if param:
             params.update(param)
-        path.mkdir(parents=True)
-        (path / 'param.toml').write_text(toml.dumps(params, encoder=toml.TomlEncoder()))
-        state_path = Path(os.path.relpath(Path(state_path).resolve(), path.resolve()))
-        (path / 'state.pt').symlink_to(state_path)
+        params = _planned(params, label, target_err, pilot)
+        if params:
+            _prepare_run(ctx, path, params, state=state_path, kind='sample')
 
 
 @click.command()
 @click.pass_context
 def cyclobutadiene(ctx):
+    runs = []
     for label in ['ground', 'transition']:
         path = ctx.obj['basedir'] / label
-        print(path)
         param = NestedDict()
         param['system'] = f'dlqmc.systems:cyclobutadiene_{label}'
         param['model_kwargs.cas'] = [8, 4]
@@ -173,8 +435,8 @@ def cyclobutadiene(ctx):
         param['train_kwargs.fit_kwargs.subbatch_size'] = 500
         param['train_kwargs.sampler_kwargs.n_decorrelate'] = 20
         param['train_kwargs.lr_scheduler_kwargs.CyclicLR.step_size_up'] = 375
-        path.mkdir(parents=True)
-        (path / 'param.toml').write_text(toml.dumps(param, encoder=toml.TomlEncoder()))
+        runs.append((path, param))
+    _prepare_runs(ctx, runs)
 
 
 @click.command()
@@ -206,14 +468,12 @@ def boron(ctx):
             [('qx2', {'train_kwargs.fit_kwargs.q': 10})],
         ),
     )
+    runs = []
     for use_slgld, (cas, conf_lim), epoch_size, (extra_lbl, extra) in payload:
         label = f'{use_slgld}_ndet-{conf_lim}_epoch-{epoch_size}'
         if extra:
             label += f'_{extra_lbl}'
         path = ctx.obj['basedir'] / label
-        if path.exists():
-            continue
-        print(path)
         param = NestedDict()
         param['system'] = 'B'
         param['train_kwargs.n_steps'] = 10_000
@@ -230,5 +490,101 @@ def boron(ctx):
         param['train_kwargs.epoch_size'] = epoch_size
         for k, v in extra.items():
             param[k] = v
-        path.mkdir(parents=True)
-        (path / 'param.toml').write_text(toml.dumps(param, encoder=toml.TomlEncoder()))
+        runs.append((path, param))
+    _prepare_runs(ctx, runs)
+
+
+@click.command()
+@click.argument('spec', type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def sweep(ctx, spec):
+    from .sweep import expand_sweep
+
+    spec = toml.loads(Path(spec).read_text())
+    runs = [(ctx.obj['basedir'] / lbl, params) for lbl, params in expand_sweep(spec)]
+    _prepare_runs(ctx, runs, dedup=True)
+
+
+def _scan_axis(spec):
+    import numpy as np
+
+    if ':' not in spec:
+        return [float(spec)]
+    start, stop, num = spec.split(':')
+    return np.linspace(float(start), float(stop), int(num))
+
+
+@click.command()
+@click.argument('zmat')
+@click.option(
+    '-p',
+    '--param',
+    'axes',
+    multiple=True,
+    help='Scanned parameter as NAME=VALUE or NAME=START:STOP:NUM.',
+)
+@click.option(
+    '--between',
+    nargs=2,
+    help='Interpolate all parameters between two named geometries.',
+)
+@click.option('-n', '--num', default=11, show_default=True)
+@click.option('--charge', default=0, show_default=True)
+@click.option('--spin', default=0, show_default=True)
+@click.option(
+    '--base',
+    type=click.Path(exists=True, dir_okay=False),
+    help='TOML file with parameters common to all runs.',
+)
+@click.pass_context
+def scan(ctx, zmat, axes, between, num, charge, spin, base):
+    import numpy as np
+
+    from . import systems
+
+    if zmat not in systems.ZMATS:
+        raise click.BadParameter(
+            f'choose from {list(systems.ZMATS)}', param_hint='ZMAT'
+        )
+    unknown = set(between or ()) - set(systems.GEOMETRIES)
+    if unknown:
+        raise click.BadParameter(
+            f'choose from {list(systems.GEOMETRIES)}', param_hint='--between'
+        )
+    points = [{}]
+    if between:
+        (zmat_start, start), (zmat_stop, stop) = (
+            systems.GEOMETRIES[name] for name in between
+        )
+        if not zmat_start == zmat_stop == zmat:
+            raise click.BadParameter(f'Geometries are not {zmat} geometries')
+        points = [
+            {k: start[k] + t * (stop[k] - start[k]) for k in start}
+            for t in np.linspace(0, 1, num)
+        ]
+    for axis in axes:
+        name, spec = axis.split('=', 1)
+        points = [{**p, name: v} for p in points for v in _scan_axis(spec)]
+    points = [{k: round(float(v), 6) for k, v in p.items()} for p in points]
+    try:
+        systems.scan_geometries(zmat, points)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    # the shortest repr of the rounded values is a lossless label
+    labels = ['_'.join(f'{k}-{v!r}' for k, v in sorted(p.items())) for p in points]
+    duplicate = [label for label, n in Counter(labels).items() if n > 1]
+    if duplicate:
+        raise click.UsageError(f'Points scanned twice: {", ".join(sorted(duplicate))}')
+    base = toml.loads(Path(base).read_text()) if base else {}
+    runs = []
+    for label, point in zip(labels, points):
+        params = NestedDict(base)
+        params['system'] = {
+            'name': 'dlqmc.systems:zmat_system',
+            'zmat': zmat,
+            'charge': charge,
+            'spin': spin,
+            **point,
+        }
+        runs.append((ctx.obj['basedir'] / label, params))
+    _prepare_runs(ctx, runs)
@@ -0,0 +1,698 @@
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+from . import data
+
+FIGURES = {}
+OUTPUT_DIR = 'pub/figs'
+STATE_FILE = '.figures-state.json'
+STYLE = {
+    'figure.dpi': 150,
+    'font.family': 'serif',
+    'font.serif': 'STIXGeneral',
+    'font.size': 9,
+    'mathtext.fontset': 'stix',
+    'axes.titlesize': 9,
+}
+SAVEFIG_KWARGS = {
+    'transparent': True,
+    'dpi': 600,
+    'bbox_inches': 'tight',
+    'pad_inches': 0.03,
+}
+SYSTEMS_SMALL = ['H2', 'LiH', 'Li2', 'Be', 'B', 'C']
+ANSATZES_SMALL = ['SD-SJ', 'SD-SJBF', 'MD-SJ', 'MD-SJBF']
+H10_DISTANCES = [1.2, 1.4, 1.6, 1.8, 2.0, 2.4, 2.8, 3.2, 3.6]
+
+
+def figure(name, inputs=()):
+    def decorator(func):
+        FIGURES[name] = {'func': func, 'inputs': inputs}
+        return func
+
+    return decorator
+
+
+def _file_hash(path):
+    sha = hashlib.sha1()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def figure_signature(name, root, ext):
+    fig = FIGURES[name]
+    files = [
+        (str(path.relative_to(root)), _file_hash(path))
+        for pttrn in fig['inputs']
+        for path in sorted(root.glob(pttrn))
+    ]
+    # the figures share helpers and the scales of mplext
+    sources = [Path(__file__), Path(__file__).with_name('mplext.py')]
+    code = [*(path.read_text() for path in sources), json.dumps(STYLE), ext]
+    payload = json.dumps([code, files])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def render_figure(name, root, output, ext):
+    import matplotlib
+
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    from . import mplext  # noqa: F401, registers the corr_energy scale
+
+    plt.rcParams.update(STYLE)
+    fig = FIGURES[name]['func'](root)
+    tmp = output / f'.{name}.tmp.{ext}'
+    fig.savefig(tmp, **SAVEFIG_KWARGS)
+    plt.close(fig)
+    tmp.replace(output / f'{name}.{ext}')
+    return name
+
+
+def render_figures(root, names=None, output=None, ext='pdf', force=False, workers=None):
+    root = Path(root)
+    output = Path(output) if output else root / OUTPUT_DIR
+    output.mkdir(parents=True, exist_ok=True)
+    state_path = output / STATE_FILE
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    futures, signatures = {}, {}
+    with ProcessPoolExecutor(workers) as executor:
+        for name in names or FIGURES:
+            sig = figure_signature(name, root, ext)
+            if (
+                not force
+                and state.get(name) == sig
+                and (output / f'{name}.{ext}').exists()
+            ):
+                yield name, 'up to date'
+                continue
+            signatures[name] = sig
+            futures[name] = executor.submit(render_figure, name, root, output, ext)
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                # a missing input must not keep the other figures from rendering
+                state.pop(name, None)
+                status = f'failed, {type(e).__name__}: {e}'
+            else:
+                state[name] = signatures[name]
+                status = 'rendered'
+            state_path.write_text(json.dumps(state, indent=2))
+            yield name, status
+
+
+def to_corr(x, ref):
+    return (ref[0] - x) / (ref[0] - ref[1])
+
+
+def to_corr_error(x, ref):
+    return x / (ref[0] - ref[1])
+
+
+def _exact_refs(path):
+    import pandas as pd
+
+    refs = pd.read_csv(path).set_index('system')
+    return {system: row.values for system, row in refs[['HF', 'exact']].iterrows()}
+
+
+def _label(system):
+    return fr'$\mathrm{{{system.replace("2", "_2")}}}$'
+
+
+def _log_det_axis(ax, labels):
+    import matplotlib.ticker
+
+    ax.set_xscale('log')
+    ax.set_xticks([1, 10, 100, 1000])
+    ax.set_xticklabels(labels)
+    ax.xaxis.set_minor_locator(matplotlib.ticker.LogLocator(subs=(4, 7), numticks=8))
+    ax.set_xticklabels([], minor=True)
+
+
+def _small_systems_refs(references, refs_exact, ref, system):
+    if (ref, system) not in references.index:
+        return np.full((4, 3), np.nan)
+    ref_i = references.loc(0)[ref].loc(0)[system].loc(0)
+    rows = []
+    for ansatz in ANSATZES_SMALL:
+        if np.isnan(ref_i[f'{ansatz} energy']):
+            rows.append((np.nan, np.nan, np.nan))
+            continue
+        energy = 100 - 100 * to_corr(ref_i[f'{ansatz} energy'], refs_exact[system])
+        error = 100 * to_corr_error(ref_i[f'{ansatz} error'], refs_exact[system])
+        n_csf = 1 if 'SD' in ansatz else ref_i[f'{ansatz} nCSF']
+        rows.append((energy, error, n_csf))
+    return np.array(rows)
+
+
+def _small_systems_label_reposition():
+    label_reposition = np.ones([6, 6, 4, 2])  # H2 LiH Li2 Be B C / ref / ansatz
+    label_reposition[
+        [2, 2, 3, 4, 4, 5, 5, 5, 5, 5, 5, 5],
+        [5, 2, 0, 2, 5, 5, 3, 0, 5, 3, 0, 2],
+        [0, 2, 3, 2, 2, 0, 0, 0, 2, 1, 1, 2],
+    ] = np.array(
+        [
+            [1, 0.85],
+            [0.25, 1],
+            [1, 1.2],
+            [0.25, 1],
+            [1, 1.2],
+            [1.1, 1],
+            [1, 1.25],
+            [1.1, 1.2],
+            [1.3, 1.0],
+            [1.0, 0.9],
+            [1.0, 0.9],
+            [0.25, 1],
+        ]
+    )
+    return label_reposition
+
+
+def _small_systems_legend(ax):
+    from matplotlib.legend_handler import HandlerTuple
+
+    handles = [
+        ax.errorbar([], [], ls='', marker='o', c='C0')[0],
+        ax.errorbar([], [], ls='', marker='o', c='C1')[0],
+        ax.errorbar([], [], fillstyle='none', ls='', marker='o', c='black')[0],
+        (
+            ax.errorbar([], [], ls='', marker='^', c='black')[0],
+            ax.errorbar([], [], ls='', fillstyle='none', marker='^', c='black')[0],
+        ),
+    ]
+    ax.legend(
+        handles,
+        ['PauliNet', 'other works', 'without backflow', 'uses CSFs'],
+        numpoints=1,
+        handler_map={tuple: HandlerTuple(ndivide=None)},
+        loc='lower left',
+        bbox_to_anchor=(0.5, 1.06),
+        ncol=2,
+        handletextpad=0.5,
+        columnspacing=1,
+    )
+
+
+@figure(
+    'small-systems',
+    inputs=[
+        'data/final/small-systems.csv',
+        'data/extern/small-systems-vmc.csv',
+        'data/extern/small-systems-exact.csv',
+    ],
+)
+def small_systems(root):
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker
+    import pandas as pd
+
+    refs_qmc = pd.read_csv(root / 'data/extern/small-systems-vmc.csv').set_index(
+        ['reference', 'system']
+    )
+    refs_exact = _exact_refs(root / 'data/extern/small-systems-exact.csv')
+    results = data.load('small-systems', root=root).set_index(['system', 'ansatz'])
+    label_reposition = _small_systems_label_reposition()
+    fig, axs = plt.subplots(
+        1,
+        5,
+        sharex=True,
+        sharey=True,
+        figsize=(3.7, 4.5),
+        gridspec_kw=dict(hspace=0.08, wspace=0.09),
+    )
+    for s, (system, ax) in enumerate(zip(SYSTEMS_SMALL[:-1], axs)):
+        ax.set_title(_label(system))
+        ds = np.array(
+            [
+                (
+                    100 - 100 * to_corr(row['energy'], refs_exact[system]),
+                    100 * to_corr_error(row['err'], refs_exact[system]),
+                )
+                for row in (results.loc[system, a] for a in ANSATZES_SMALL)
+            ]
+        )
+        for k in range(2):
+            ax.errorbar(
+                [1, 1, 6, 6][k::2],
+                ds[k::2, 0].clip(0.05),
+                ds[k::2, 1],
+                ls='',
+                marker='o',
+                fillstyle=['none', 'full'][k],
+                ms=7,
+                color='C0',
+                clip_on=False,
+            )
+        for i, p in enumerate(ds[:, 0]):
+            if p < 0.05:
+                ax.annotate(
+                    '',
+                    xy=([1, 6][i // 2], 0.05),
+                    xytext=([1, 6][i // 2], 0.03),
+                    arrowprops=dict(arrowstyle='<-'),
+                    annotation_clip=False,
+                )
+        refs = ['Brown', 'Casalengo', 'Morales', 'Rios', 'Seth', 'Toulouse']
+        for j, ref in enumerate(refs):
+            dj = _small_systems_refs(refs_qmc, refs_exact, ref, system)
+            for k, l in product([1, 0], range(2)):
+                ax.errorbar(
+                    dj[k + 2 * l, 2],
+                    dj[k + 2 * l, 0],
+                    dj[k + 2 * l, 1],
+                    fillstyle=['none', 'full'][k],
+                    ls='',
+                    marker=['o', '^'][l],
+                    c='C1',
+                    ms=6,
+                )
+            for i, (y, _, x) in enumerate(dj):
+                ax.annotate(j + 1, (x * 1.9, y * 1.05) * label_reposition[s, j, i])
+        ax.set_yscale('log')
+        ax.set_xscale('log')
+        ax.set_yticks([0.1, 1, 10])
+        ax.set_yticklabels(['99.9%', '99%', '90%'])
+        ax.set_xticks([1, 10, 100])
+        ax.set_xticklabels([1, 10, 100])
+        ax.xaxis.set_minor_locator(
+            matplotlib.ticker.LogLocator(subs=(4, 7), numticks=8)
+        )
+        ax.set_ylim(60, 0.05)
+        ax.set_xlim(0.6, 1000)
+        ax.grid(axis='y', which='major', ls='dotted')
+    _small_systems_legend(axs[0])
+    fig.text(0.5, 0.03, 'number of determinants/CSFs', ha='center')
+    fig.text(-0.02, 0.5, 'correlation energy', va='center', rotation='vertical')
+    return fig
+
+
+@figure(
+    'learning-curves',
+    inputs=['data/final/learning-curves.csv', 'data/extern/small-systems-exact.csv'],
+)
+def learning_curves(root):
+    import matplotlib.pyplot as plt
+
+    systems = ['H2', 'Be', 'B', 'LiH', 'Li2']
+    refs_exact = _exact_refs(root / 'data/extern/small-systems-exact.csv')
+    results = data.load('learning-curves', root=root)
+    curves = dict(list(results.groupby(['system', 'ansatz'], observed=True)))
+    fig, axes = plt.subplots(
+        len(systems),
+        len(ANSATZES_SMALL),
+        figsize=(3.3, 4.3),
+        gridspec_kw=dict(hspace=0.1, wspace=0.09),
+        sharex=True,
+        sharey=True,
+    )
+    for (i, system), (j, ansatz) in product(
+        enumerate(systems), enumerate(ANSATZES_SMALL)
+    ):
+        ax = axes[i, j]
+        curve = curves[system, ansatz]
+        inds = np.unique(np.geomspace(1, len(curve) - 1, 200).astype(int))
+        step = curve['step'].values[inds]
+        energy = to_corr(curve['energy'].values[inds], refs_exact[system])
+        err = to_corr_error(curve['err'].values[inds], refs_exact[system])
+        ax.plot(step, energy, color='#444444')
+        ax.fill_between(step, energy + err, energy - err, color='grey', alpha=0.5)
+        _log_det_axis(ax, [1, None, None, 1000])
+        ax.set_yscale('corr_energy')
+        ax.set_xlim(1, 1e4)
+        ax.set_ylim(-0.3, 0.9993)
+        ax.grid(axis='y', which='major', ls='dotted')
+        if i == 0:
+            ax.set_title(ansatz)
+        if j == 0:
+            ax.set_ylabel(_label(system), labelpad=22)
+    fig.text(0.5, 0.03, 'iterations', ha='center')
+    fig.text(-0.05, 0.5, 'correlation energy', rotation='vertical', va='center')
+    return fig
+
+
+def _h10_legend(ax, plots):
+    from matplotlib.lines import Line2D
+
+    lines_vmc = [
+        Line2D(
+            [0], [0], ls=ls, fillstyle='none', lw=1.2, marker='o', ms='4', color='C1'
+        )
+        for ls in ['-', 'dotted']
+    ]
+    handles = [*plots, *lines_vmc]
+    ax.legend(
+        [handles[i] for i in [0, 1, 5, 2, 3, 4]],
+        ['HF', 'MRCI+Q-F12', 'VMC', 'SD-SJ', 'SD-SJBF', 'MD-SJBF'],
+        loc='lower center',
+        bbox_to_anchor=(0.41, 3.1),
+        ncol=3,
+        columnspacing=0.75,
+    )
+
+
+@figure(
+    'h10-dis-curve',
+    inputs=[
+        'data/final/h10.csv',
+        'data/extern/motta-hydrogen/N_10_OBC/R_*/*',
+        'assets/h10.png',
+    ],
+)
+def h10(root):
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker
+
+    ref_dir = root / 'data/extern/motta-hydrogen/N_10_OBC'
+    refs = {
+        ref: np.array([np.loadtxt(ref_dir / f'R_{d}' / ref) for d in H10_DISTANCES])
+        for ref in ['RHF_CBS', 'MRCI+Q+F12_CBS', 'VMC_AGP_basis-TZ', 'VMC_LDA_basis-TZ']
+    }
+    ref_enes = refs['RHF_CBS'][:, 0], refs['MRCI+Q+F12_CBS'][:, 0]
+    ansatzes = ['SD-SJ', 'SD-SJBF', 'MD-SJBF']
+    results = data.load('h10', root=root).set_index(['ansatz', 'system'])
+    systems = [f'H10_d{d}' for d in H10_DISTANCES]
+    results = {
+        ansatz: results.loc[ansatz].loc[systems, ['energy', 'err']].values
+        for ansatz in ansatzes
+    }
+    fig, (ax2, ax1) = plt.subplots(
+        2,
+        1,
+        figsize=(3.63, 3.63),
+        sharex=True,
+        gridspec_kw=dict(hspace=0.06, height_ratios=(2, 1)),
+    )
+    plots = [
+        *ax1.plot(H10_DISTANCES, ref_enes[0], ls=':', color='r', label='RHF'),
+        *ax1.plot(H10_DISTANCES, ref_enes[1], color='k', label='MRCI+Q-F12', zorder=10),
+    ]
+    for ax, to_ax in [(ax1, lambda x: x), (ax2, lambda x: to_corr(x, ref_enes))]:
+        for i, ansatz in enumerate(ansatzes):
+            err = results[ansatz][:, 1]
+            plot = ax.errorbar(
+                H10_DISTANCES,
+                to_ax(results[ansatz][:, 0]),
+                err if ax is ax1 else to_corr_error(err, ref_enes),
+                label=ansatz,
+                ls=[':', 'dashed', '-'][i],
+                fillstyle=['none', 'full', 'full'][i],
+                marker='o',
+                ms='4',
+                color='C0',
+            )
+            if ax is ax1:
+                plots.append(plot)
+    ax1.grid(axis='y', which='major', ls='dotted')
+    ax1.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(0.4))
+    ax1.yaxis.set_minor_locator(matplotlib.ticker.MultipleLocator(0.1))
+    ax1.set_ylabel(r'total energy [$E_{\mathrm{h}}$]')
+    ax1.set_xlabel(r'H–H distance [$r_{\mathrm{Bohr}}$]')
+    ax1.set_ylim(-5.75, None)
+    _h10_legend(ax1, plots)
+    for i, ref in enumerate(['VMC_AGP_basis-TZ', 'VMC_LDA_basis-TZ']):
+        ax2.errorbar(
+            H10_DISTANCES,
+            to_corr(refs[ref][:, 0], ref_enes),
+            to_corr_error(refs[ref][:, 1], ref_enes),
+            ls=['dashed', 'dotted'][i],
+            lw=1.2,
+            fillstyle='none',
+            marker='o',
+            ms='4',
+            color='C1',
+        )
+    ax = ax1.inset_axes((1.3, -5.8, 1.75, 2), transform=ax1.transData)
+    ax.imshow(plt.imread(root / 'assets/h10.png'))
+    ax.set_axis_off()
+    ax2.grid(axis='y', which='major', ls='dotted')
+    ax2.set_yscale('corr_energy')
+    ax2.set_ylabel('correlation energy')
+    return fig
+
+
+@figure('dist-features')
+def dist_features(root):
+    import matplotlib.pyplot as plt
+    import torch
+
+    from deepqmc.wf.paulinet import DistanceBasis
+
+    fig, ax = plt.subplots(figsize=(2, 2))
+    x = torch.linspace(0, 12, 300)
+    ax.plot(x.numpy(), DistanceBasis(32, envelope='nocusp')(x).numpy())
+    ax.set_xlabel(r'$r/a_0$')
+    ax.set_ylabel(r'$\mathbf{e}(r)$')
+    ax.set_yticks([0, 0.4])
+    return fig
+
+
+def _plot_vmc_dmc(ax, dets, e_vmc, e_dmc, e_ref, label, color, marker):
+    (p_vmc,) = ax.plot(
+        dets,
+        to_corr(e_vmc, e_ref),
+        label=f'ref. [{label}]',
+        ls=' ',
+        fillstyle='none',
+        marker=marker,
+        color=color,
+        ms=5,
+    )
+    (p_dmc,) = ax.plot(
+        dets, to_corr(e_dmc, e_ref), ls=' ', marker='x', fillstyle='none', color=color
+    )
+    ax.plot(
+        [dets, dets],
+        [to_corr(e_vmc, e_ref), to_corr(e_dmc, e_ref)],
+        color=color,
+        ls=':',
+    )
+    return p_vmc, p_dmc
+
+
+def _diatomics_legend(ax, p_pn):
+    from matplotlib.legend_handler import HandlerTuple
+
+    plots = [
+        (
+            ax.plot([], [], ls='', color='black', fillstyle='none', marker='o')[0],
+            ax.plot([], [], ls='', color='black', fillstyle='none', marker='^')[0],
+        ),
+        ax.plot([], [], ls='', color='black', fillstyle='none', marker='x')[0],
+    ]
+    ax.legend(
+        [p_pn, *plots],
+        ['PauliNet', 'VMC other works', 'DMC other works'],
+        numpoints=1,
+        handler_map={tuple: HandlerTuple(ndivide=None)},
+        loc='lower center',
+        bbox_to_anchor=(0.87, 1.03),
+        ncol=2,
+        columnspacing=0.7,
+    )
+
+
+@figure(
+    'diatomics',
+    inputs=[
+        'data/final/diatomics.csv',
+        'data/extern/diatomics-qmc.csv',
+        'data/extern/diatomics-exact.csv',
+    ],
+)
+def diatomics(root):
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    refs_qmc = pd.read_csv(root / 'data/extern/diatomics-qmc.csv')
+    refs_qmc = refs_qmc.set_index(['system', 'ref'])
+    refs_exact = _exact_refs(root / 'data/extern/diatomics-exact.csv')
+    results = data.load('diatomics', root=root).set_index(['system', 'ndet'])
+    dets = [1, 3, 10, 30, 100]
+    refs = {'Filippi': 'FU', 'Toulouse': 'TU', 'Morales': 'Mo'}
+    fig, axes = plt.subplots(
+        2,
+        2,
+        sharex=True,
+        sharey=True,
+        figsize=(3.5, 2.6),
+        gridspec_kw=dict(hspace=0.08, wspace=0.06),
+    )
+    for ax, system in zip(axes.flat, ['Li2', 'Be2', 'B2', 'C2']):
+        ek = results.loc[system].loc[dets, ['energy', 'err']].values
+        energy = to_corr(ek[:, 0], refs_exact[system])
+        p_pn = ax.errorbar(
+            dets,
+            energy,
+            to_corr_error(ek[:, 1], refs_exact[system]),
+            ms=5,
+            marker='o',
+            ls='',
+            color='C0',
+            linewidth=2,
+            label='PauliNet',
+        )
+        ax.plot(dets, energy, ls=':', color='grey', linewidth=2, zorder=0)
+        for (ref, label), color, marker in zip(refs.items(), 'gry', 'o^^'):
+            ref_j = refs_qmc.loc(0)[system, ref]
+            _plot_vmc_dmc(
+                ax,
+                ref_j['ndet'],
+                ref_j['e_vmc'],
+                ref_j['e_dmc'],
+                refs_exact[system],
+                label,
+                color,
+                marker,
+            )
+        _log_det_axis(ax, [1, 10, 100, 1000])
+        ax.set_xlim(0.5, 5_000)
+        ax.set_yscale('corr_energy')
+        ax.set_ylim(0.7, 0.9992)
+        ax.grid(axis='y', which='major', ls='dotted')
+        ax.annotate(_label(system), (0.05, 0.8), xycoords='axes fraction')
+        if ax is axes.flat[0]:
+            _diatomics_legend(ax, p_pn)
+    fig.text(0.5, -0.02, 'number of determinants/CSFs', ha='center', va='center')
+    fig.text(
+        -0.04, 0.5, 'correlation energy', ha='center', va='center', rotation='vertical'
+    )
+    return fig
+
+
+@figure('ndets')
+def ndets(root):
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+
+    fig, ax = plt.subplots(figsize=(2.55, 1.6))
+    payload = [
+        ('multideterminant\nQMC + NNs', 2, 50),
+        ('multideterminant QMC', 100, 1e5),
+        ('configuration\ninteraction + NNs', 1e5, 1e6),
+        ('configuration interaction', 2e6, 2e9),
+    ]
+    for i, (_, fro, to) in enumerate(payload):
+        ax.add_patch(Rectangle((fro, i + 0.1), to - fro, 0.8, color='grey'))
+    ax.set_xlim(1, 1e10)
+    ax.set_ylim(0, 4)
+    ax.set_xscale('log')
+    ax.set_xlabel('number of determinants')
+    ax.axvline(1e5, color='black', ls='dashed')
+    ax.text(2.5, 4.3, '1st quantization', fontstyle='italic')
+    ax.text(2.0e5, 4.3, '2nd quantization', fontstyle='italic')
+    ax.set_yticks([0.5, 1.5, 2.5, 3.5])
+    ax.set_yticklabels([l for l, *_ in payload], ha='right')
+    return fig
+
+
+def _cyclobutadiene_barrier(ax, barriers, colors):
+    import matplotlib.colors
+    from matplotlib.patches import Rectangle
+
+    def plot_bar(y, **kwargs):
+        ax.axhline(y, 0.1, 0.9, lw=1.5, **kwargs)
+
+    def plot_rect(fro, to, w, **kwargs):
+        ax.add_patch(Rectangle((0.5 - w / 2, fro), w, to - fro, ec=None, **kwargs))
+
+    plot_bar(18.3, color='red', ls='dashed', label='CCSD(T)')
+    # BW-MRCCSD(T), MRCISD+Q, Mk-MRCCSD(T), RMRCCSD(T), MR-DI-EOMCCSD
+    plot_bar(6.8, color='black', label='MR-CC')
+    for y in [8.75, 8.95, 9.5, 10.7]:
+        plot_bar(y, color='black')
+    plot_rect(
+        1.6,
+        10,
+        0.75,
+        color=matplotlib.colors.to_rgb(colors[1]) + (0.5,),
+        zorder=-120,
+        label='experiment',
+    )
+    plot_rect(
+        barriers.min(),
+        barriers.max(),
+        0.65,
+        color=matplotlib.colors.to_rgb(colors[0]) + (1,),
+        zorder=-100,
+        label='PauliNet',
+    )
+
+
+@figure(
+    'cyclobutadiene-training',
+    inputs=[
+        'data/final/cyclobutadiene-fit.csv',
+        'data/final/cyclobutadiene-sample.csv',
+        'assets/cclbd.png',
+    ],
+)
+def cyclobutadiene(root):
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker
+
+    from .mplext import plot_decimated
+
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    samples = data.load('cyclobutadiene-sample', root=root)
+    enes = samples.groupby(['batch', 'state'], observed=True)['energy'].mean().unstack()
+    barriers = 632 * (enes['transition'] - enes['ground']).values
+    fits = data.load('cyclobutadiene-fit', root=root)
+    fig = plt.figure(constrained_layout=False, figsize=(3.63, 4.5))
+    gs = fig.add_gridspec(nrows=4, ncols=7, wspace=2)
+    ax = fig.add_subplot(gs[1:, 1:4])
+    ax1 = fig.add_subplot(gs[1:, 5:7])
+    ax2 = fig.add_subplot(gs[0, :])
+    ax.axhline(-153.71, c='red', ls='dotted', label='HF')
+    ax.axhline(-154.25, c='black', ls='dotted', label='CCSD(T)')
+    ax.axhline(-154.45, c='black', ls='dotted')
+    ax.axhline(-154.55, c='black', ls='dotted')
+    for state, traj in fits[fits['batch'] == 250].groupby('state', observed=True):
+        color = {'ground': colors[0], 'transition': 'lightskyblue'}[state]
+        label = 'minimum' if state == 'ground' else state
+        plot_decimated(ax, traj['step'], traj['energy_ewm'], label=label, color=color)
+    ax.set_ylim(-154.65, -153.6)
+    ax.set_xlim(10, None)
+    ax.yaxis.set_major_locator(matplotlib.ticker.MultipleLocator(0.5))
+    ax.yaxis.set_minor_locator(matplotlib.ticker.MultipleLocator(0.1))
+    ax.grid(axis='y', which='major')
+    ax.grid(axis='y', which='minor', ls='dotted')
+    ax.set_xscale('log')
+    ax.set_xlabel('iterations')
+    ax.set_ylabel(r'total energy [$E_{\mathrm{h}}$]')
+    ax.text(-0.63, 0.98, 'b', transform=ax.transAxes, va='top', weight='bold')
+    ax.legend(
+        loc='upper center', bbox_to_anchor=(0.3, -0.18), ncol=2, columnspacing=0.7
+    )
+    _cyclobutadiene_barrier(ax1, barriers, colors)
+    ax1.set_xlim(0, 1)
+    ax1.set_xticks([])
+    ax1.set_ylim(-1, 21)
+    ax1.yaxis.set_major_locator(matplotlib.ticker.MultipleLocator(5))
+    ax1.yaxis.set_minor_locator(matplotlib.ticker.MultipleLocator(1))
+    ax1.grid(axis='y', which='major', ls='dotted')
+    ax1.set_ylabel('transition barrier [kcal/mol]')
+    ax1.text(-0.7, 0.98, 'c', transform=ax1.transAxes, va='top', weight='bold')
+    handles, labels = ax1.get_legend_handles_labels()
+    order = [2, 0, 1, 3]
+    ax1.legend(
+        [handles[i] for i in order],
+        [labels[i] for i in order],
+        loc='upper center',
+        bbox_to_anchor=(0.1, -0.05),
+    )
+    ax2.imshow(plt.imread(root / 'assets/cclbd.png'))
+    ax2.set_axis_off()
+    ax2.text(-0.08, 0.98, 'a', transform=ax2.transAxes, va='top', weight='bold')
+    return fig
@@ -0,0 +1,118 @@
+import json
+import time
+from itertools import count
+from pathlib import Path
+
+import click
+import numpy as np
+import toml
+
+from .analysis import infinite_training_limit
+from .catalog import STOP_NAME, Catalog
+from .monitor import RunMonitor
+from .runner import _n_steps, find_runs
+from .tools import short_fmt
+
+STATE_NAME = 'halving.json'
+
+
+def rung_steps(min_steps, eta, n_steps):
+    steps = []
+    while min_steps < n_steps:
+        steps.append(min_steps)
+        min_steps *= eta
+    return steps
+
+
+class SuccessiveHalving:
+    def __init__(self, tree, eta=3, min_steps=250, start=100):
+        self.tree = Path(tree).resolve()
+        self.eta = eta
+        self.min_steps = min_steps
+        self.start = start
+        self.state_path = self.tree / STATE_NAME
+        if self.state_path.exists():
+            self.state = json.loads(self.state_path.read_text())
+        else:
+            self.state = {'rungs': {}, 'stopped': {}}
+        self.monitors = {}
+
+    def rel(self, path):
+        return path.relative_to(self.tree).as_posix()
+
+    def scan(self):
+        pending = {path for path, kind in find_runs(self.tree) if kind == 'train'}
+        for path in set(self.monitors) - pending:
+            self.monitors.pop(path)[0].close()
+        for path in pending - set(self.monitors):
+            rungs = rung_steps(self.min_steps, self.eta, _n_steps(path))
+            self.monitors[path] = RunMonitor(path / 'fit.h5', self.start), rungs
+
+    def _stop(self, path, reason):
+        (path / STOP_NAME).write_text(toml.dumps(reason))
+        self.state['stopped'][self.rel(path)] = reason
+        catalog = Catalog.find(path)
+        if catalog:
+            with catalog:
+                catalog.set_status(path, 'stopped')
+
+    def _judge(self, step, score):
+        recorded = self.state['rungs'][str(step)].values()
+        scores = [x for x in recorded if np.isfinite(x)]
+        cutoff = np.percentile(scores, 100 / self.eta) if scores else np.nan
+        if np.isfinite(score) and score <= cutoff:
+            return None
+        return {
+            'reason': f'Einf at rung {step} not in best 1/{self.eta}',
+            'rung': step,
+            'Einf': score,
+            'cutoff': float(cutoff),
+            'n_compared': len(scores),
+            'time': time.time(),
+        }
+
+    def update(self):
+        reached = []
+        for path, (mon, rungs) in sorted(self.monitors.items()):
+            if not mon.poll():
+                continue
+            for step in rungs:
+                recorded = self.state['rungs'].setdefault(str(step), {})
+                if step > mon.n_steps or self.rel(path) in recorded:
+                    continue
+                Einf, _, _ = infinite_training_limit(mon.itl.energy[:step], self.start)
+                recorded[self.rel(path)] = Einf.n
+                reached.append((step, path, Einf))
+        # judge only after recording, so runs reaching a rung together compete
+        events = []
+        for step, path, Einf in sorted(reached):
+            if path not in self.monitors:
+                continue
+            reason = self._judge(step, Einf.n)
+            events.append((self.rel(path), step, Einf, reason))
+            if reason:
+                self._stop(path, reason)
+                self.monitors.pop(path)[0].close()
+        tmp = self.state_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state, indent=2))
+        tmp.replace(self.state_path)
+        return events
+
+    def close(self):
+        for mon, _ in self.monitors.values():
+            mon.close()
+
+
+def halve_runs(tree, eta=3, min_steps=250, start=100, interval=60, once=False):
+    sha = SuccessiveHalving(tree, eta, min_steps, start)
+    try:
+        for _ in count():
+            sha.scan()
+            for rel, step, Einf, reason in sha.update():
+                action = 'stopped' if reason else 'continues'
+                click.echo(f'{rel}: rung {step}, Einf = {short_fmt(Einf)}, {action}')
+            if once or not sha.monitors:
+                break
+            time.sleep(interval)
+    finally:
+        sha.close()
@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from pathlib import Path
+
+import click
+import h5py
+import numpy as np
+
+from .analysis import BatchedEWM, InfiniteTrainingLimit
+from .tools import short_fmt
+from .uarray import UArray
+
+
+class RunMonitor:
+    def __init__(self, path, start=100):
+        self.path = path
+        self.n_steps = 0
+        self.ewm = BatchedEWM(1)
+        self.itl = InfiniteTrainingLimit(start)
+        self._file = None
+        self._stat = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def poll(self):
+        try:
+            return self._poll()
+        except OSError:
+            self.close()
+            self._stat = None
+            return False
+
+    def _poll(self):
+        st = self.path.stat()
+        if (st.st_mtime_ns, st.st_size) == self._stat:
+            return False
+        self._stat = st.st_mtime_ns, st.st_size
+        if self._file is None:
+            self._file = h5py.File(self.path, 'r', swmr=True)
+        if 'E_loc' not in self._file:
+            # datasets created after opening are invisible to a SWMR reader
+            self.close()
+            self._stat = None
+            return False
+        ds = self._file['E_loc']
+        ds.refresh()
+        E_loc = ds[self.n_steps :]
+        # the last row may have been allocated but not written yet
+        if len(E_loc) and not E_loc[-1].any():
+            E_loc = E_loc[:-1]
+            self._stat = None
+        if not len(E_loc):
+            return False
+        E_mean = np.where(E_loc.any(axis=-1), E_loc.mean(axis=-1), np.nan)
+        for E in E_mean:
+            self.ewm.update(E[None])
+        self.itl.update(E_mean)
+        self.n_steps += len(E_mean)
+        return True
+
+    def row(self, basedir):
+        E_ewm = self.ewm.mean[0], self.ewm.err[0]
+        return {
+            'run': str(self.path.parent.relative_to(basedir)),
+            'step': self.n_steps,
+            'energy': short_fmt(UArray(*E_ewm)) if self.n_steps else '',
+            'Einf': short_fmt(self.itl.Einf) if self.n_steps > self.itl.start else '',
+        }
+
+
+def format_table(rows):
+    if not rows:
+        return ''
+    widths = {k: max(len(k), *(len(str(r[k])) for r in rows)) for k in rows[0]}
+    lines = ['  '.join(k.ljust(w) for k, w in widths.items())]
+    for r in rows:
+        lines.append('  '.join(str(r[k]).ljust(w) for k, w in widths.items()))
+    return '\n'.join(lines)
+
+
+def watch_runs(basedir, interval=10, start=100, workers=8, rescan_every=6, once=False):
+    basedir = Path(basedir)
+    monitors = {}
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            for i in count():
+                if i % rescan_every == 0:
+                    for path in sorted(basedir.glob('**/fit.h5')):
+                        if path not in monitors:
+                            monitors[path] = RunMonitor(path, start)
+                runs = list(monitors.values())
+                updated = list(executor.map(RunMonitor.poll, runs))
+                if once:
+                    click.echo(format_table([run.row(basedir) for run in runs]))
+                    break
+                if i == 0 or any(updated):
+                    click.clear()
+                    click.echo(format_table([run.row(basedir) for run in runs]))
+                time.sleep(interval)
+    finally:
+        for run in monitors.values():
+            run.close()
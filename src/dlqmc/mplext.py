@@ -1,4 +1,7 @@
+from functools import lru_cache
+
 import matplotlib as mpl
+import matplotlib.lines
 import matplotlib.scale
 import matplotlib.ticker
 import matplotlib.transforms
@@ -42,6 +45,21 @@ class InvertedCorrelationEnergyTransform(mpl.transforms.Transform):
         return CorrelationEnergyTransform()
 
 
+@lru_cache(maxsize=256)
+def _corr_ene_ticks(vmin, vmax, subs):
+    vmin = np.floor(corr_ene_tf(vmin))
+    vmax = np.ceil(corr_ene_tf(vmax))
+    bases = np.arange(vmin, vmax + 1e-10)
+    decades = corr_ene_inv_tf(bases)
+    ticks = np.concatenate(
+        [
+            np.arange(decades[i], decades[i + 1], 10 ** -bases[i] / subs)
+            for i in range(len(decades) - 1)
+        ]
+    )
+    return ticks
+
+
 class CorrelationEnergyLocator(mpl.ticker.Locator):
     def __init__(self, subs=1):
         self.subs = subs
@@ -51,17 +69,7 @@ class CorrelationEnergyLocator(mpl.ticker.Locator):
         return self.tick_values(vmin, vmax)
 
     def tick_values(self, vmin, vmax):
-        vmin = np.floor(corr_ene_tf(vmin))
-        vmax = np.ceil(corr_ene_tf(vmax))
-        bases = np.arange(vmin, vmax + 1e-10)
-        decades = corr_ene_inv_tf(bases)
-        ticks = np.concatenate(
-            [
-                np.arange(decades[i], decades[i + 1], 10 ** -bases[i] / self.subs)
-                for i in range(len(decades) - 1)
-            ]
-        )
-        return ticks
+        return _corr_ene_ticks(float(vmin), float(vmax), self.subs).copy()
 
     def view_limits(self, vmin, vmax):
         lims = corr_ene_tf(np.array([vmin, vmax]))
@@ -94,4 +102,57 @@ class CorrelationEnegryScale(mpl.scale.ScaleBase):
         return min(vmin, 1 - 1e-10), min(vmax, 1 - 1e-10)
 
 
+def m4_indices(x, y, n_buckets, xmin, xmax, offset=0.0):
+    lo = max(np.searchsorted(x, xmin) - 1, 0)
+    hi = min(np.searchsorted(x, xmax, 'right') + 1, len(x))
+    # points just outside the view keep the lines leaving the axes
+    bucket = np.floor((x[lo:hi] - xmin) / (xmax - xmin) * n_buckets + offset)
+    bucket = np.clip(bucket, -1, np.ceil(n_buckets + offset))
+    order = np.lexsort((y[lo:hi], bucket))
+    first = np.flatnonzero(np.diff(bucket, prepend=np.nan) != 0)
+    last = np.append(first[1:], len(bucket)) - 1
+    return lo + np.unique(np.concatenate([first, last, order[first], order[last]]))
+
+
+class DecimatedLine2D(mpl.lines.Line2D):
+    def __init__(self, x, y, oversample=4, **kwargs):
+        self._full = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        self._monotonic = bool(np.all(np.diff(self._full[0]) >= 0))
+        self._oversample = oversample
+        self._view = None
+        super().__init__(*self._full, **kwargs)
+
+    def _decimate(self):
+        x, y = self._full
+        tf = self.axes.xaxis.get_transform()
+        xmin, xmax = sorted(tf.transform(np.array(self.axes.get_xlim())))
+        bbox = self.axes.bbox
+        n_buckets = bbox.width * self._oversample
+        # align the buckets with the pixel columns
+        offset = bbox.x0 * self._oversample % 1
+        view = xmin, xmax, n_buckets, offset
+        if view == self._view:
+            return
+        self._view = view
+        if not self._monotonic or len(x) <= 4 * n_buckets or not xmin < xmax:
+            self.set_data(x, y)
+            return
+        # transforms of the scales are monotonic, so the y extrema stay the same
+        tx = tf.transform(x)
+        tx[np.isnan(tx)] = -np.inf  # masked zeros on log scales
+        idx = m4_indices(tx, y, n_buckets, xmin, xmax, offset)
+        self.set_data(x[idx], y[idx])
+
+    def draw(self, renderer):
+        self._decimate()
+        super().draw(renderer)
+
+
+def plot_decimated(ax, x, y, oversample=4, **kwargs):
+    line = DecimatedLine2D(x, y, oversample, **kwargs)
+    ax.add_line(line)
+    ax.autoscale_view()
+    return line
+
+
 mpl.scale.register_scale(CorrelationEnegryScale)
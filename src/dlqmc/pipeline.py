@@ -0,0 +1,285 @@
+import hashlib
+import inspect
+import json
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, product, takewhile
+from pathlib import Path, PurePath
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from . import data
+from .analysis import (
+    MeanErrAccumulator,
+    blocked_mean_err,
+    ewm_trajectory,
+    filter_outliers,
+    mean_err,
+    reblock,
+)
+from .profiling import span
+from .store import DATASETS, STORE_NAME, find_store_root, iter_results, locate_results
+
+STAGES = {}
+STATE_FILE = 'data/final/.process-state.json'
+
+
+def stage(name, inputs):
+    def decorator(func):
+        STAGES[name] = {
+            'func': func,
+            'inputs': inputs,
+            'output': f'data/final/{name}.csv',
+            'columnar': f'data/final/{name}.arrow',
+        }
+        return func
+
+    return decorator
+
+
+def stage_deps(name):
+    return [
+        other
+        for other, stg in STAGES.items()
+        if any(PurePath(stg['output']).match(pttrn) for pttrn in STAGES[name]['inputs'])
+    ]
+
+
+def _store_pattern(root, pttrn):
+    parts = PurePath(pttrn).parts
+    if parts[-1] == STORE_NAME:
+        return None
+    n_base = len(list(takewhile(lambda part: not set(part) & set('*?['), parts)))
+    base = root.joinpath(*parts[:n_base])
+    if find_store_root(base) is not None:
+        return base, PurePath(*parts[n_base:]).as_posix(), DATASETS[parts[-1]][0]
+
+
+def stage_signature(name, root):
+    root = Path(root).resolve()
+    stg = STAGES[name]
+    files = []
+    for pttrn in stg['inputs']:
+        covered = _store_pattern(root, pttrn)
+        if covered:
+            # stages read the store in place of the files it covers
+            store, paths, stored = locate_results(*covered)
+            store.close()
+            paths = sorted(paths - stored.keys())
+        else:
+            paths = sorted(root.glob(pttrn))
+        for path in paths:
+            st = path.stat()
+            files.append((str(path.relative_to(root)), st.st_mtime_ns, st.st_size))
+    payload = json.dumps([inspect.getsource(stg['func']), files])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def run_stage(name, root):
+    stg = STAGES[name]
+    with span(name):
+        results = stg['func'](root)
+    with span('write_csv', stage=name):
+        results.to_csv(root / stg['output'], index=False)
+    with span('write_columnar', stage=name):
+        data.write_columnar(results, root / stg['columnar'])
+    return name
+
+
+def run_pipeline(root, names=None, force=False, workers=None):
+    root = Path(root)
+    state_path = root / STATE_FILE
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    pending = set(names or STAGES)
+    with ProcessPoolExecutor(workers) as executor:
+        while pending:
+            ready = [
+                name
+                for name in sorted(pending)
+                if not any(dep in pending for dep in stage_deps(name) if dep != name)
+            ]
+            assert ready, 'Cyclic stage dependencies'
+            futures, signatures = [], {}
+            for name in ready:
+                with span('stage_signature', stage=name):
+                    sig = stage_signature(name, root)
+                outputs = ['output', 'columnar'] if data.pa else ['output']
+                if (
+                    not force
+                    and state.get(name) == sig
+                    and all((root / STAGES[name][o]).exists() for o in outputs)
+                ):
+                    yield name, False
+                    continue
+                signatures[name] = sig
+                futures.append(executor.submit(run_stage, name, root))
+            for future in futures:
+                name = future.result()
+                state[name] = signatures[name]
+                state_path.write_text(json.dumps(state, indent=2))
+                yield name, True
+            pending.difference_update(ready)
+
+
+def _nan_pad(x, shape):
+    padded = np.full(shape, np.nan)
+    padded[tuple(slice(n) for n in x.shape)] = x
+    return padded
+
+
+def _join_walkers(energies):
+    n_steps = max(len(x) for x in energies)
+    return np.concatenate([_nan_pad(x, (n_steps, x.shape[1])) for x in energies], 1)
+
+
+def _energy_frame(keys, names, datasets):
+    # one run in memory at a time, only its statistics are kept
+    ene, err = zip(*(mean_err(ds, np.s_[:, 0]) for ds in datasets))
+    _, err_blocked, tau = zip(*(blocked_mean_err(ds, np.s_[:, 0]) for ds in datasets))
+    return (
+        pd.DataFrame(
+            {'energy': ene, 'err': err, 'err_blocked': err_blocked, 'tau': tau},
+            index=pd.MultiIndex.from_tuples(keys, names=names),
+        )
+        .sort_index()
+        .reset_index()
+    )
+
+
+@stage('h10', inputs=['data/raw/data_pub_h10.h5'])
+def h10(root):
+    dists = [1.2, 1.4, 1.6, 1.8, 2.0, 2.4, 2.8, 3.2, 3.6]
+    ansatzes = ['SD-SJ', 'SD-SJBF', 'MD-SJBF']
+    keys = [(f'H10_d{d}', ansatz) for d, ansatz in product(dists, ansatzes)]
+    with h5py.File(root / 'data/raw/data_pub_h10.h5', 'r') as f:
+        datasets = [f[system][ansatz]['evaluate'] for system, ansatz in keys]
+        return _energy_frame(keys, ['system', 'ansatz'], datasets)
+
+
+@stage('small-systems', inputs=['data/raw/data_pub_small_systems.h5'])
+def small_systems(root):
+    systems = ['H2', 'LiH', 'Be', 'B', 'Li2', 'C']
+    ansatzes = ['SD-SJ', 'SD-SJBF', 'MD-SJ', 'MD-SJBF']
+    keys = list(product(systems, ansatzes))
+    with h5py.File(root / 'data/raw/data_pub_small_systems.h5', 'r') as f:
+        datasets = [f[system][ansatz]['evaluate'] for system, ansatz in keys]
+        return _energy_frame(keys, ['system', 'ansatz'], datasets)
+
+
+@stage('diatomics', inputs=['data/raw/data_pub_diatomics.h5'])
+def diatomics(root):
+    systems = ['Li2', 'Be2', 'B2', 'C2']
+    dets = [1, 3, 10, 30, 100]
+    keys = list(product(systems, dets))
+    with h5py.File(root / 'data/raw/data_pub_diatomics.h5', 'r') as f:
+        datasets = [f[system][f'{d}det']['evaluate'] for system, d in keys]
+        return _energy_frame(keys, ['system', 'ndet'], datasets)
+
+
+def _stack_ragged(arrays):
+    n_steps = np.array([len(x) for x in arrays])
+    stacked = np.full((len(arrays), n_steps.max()), np.nan)
+    for x, row in zip(arrays, stacked):
+        row[: len(x)] = x
+    return stacked, n_steps
+
+
+def _ragged_frame(keys, names, n_steps, **columns):
+    idx, step = (np.arange(n_steps.max()) < n_steps[:, None]).nonzero()
+    keys = pd.DataFrame([keys[i] for i in idx], columns=names)
+    return keys.assign(step=step, **{k: v[idx, step] for k, v in columns.items()})
+
+
+@stage('learning-curves', inputs=['data/raw/data_pub_small_systems.h5'])
+def learning_curves(root):
+    systems = ['H2', 'LiH', 'Be', 'B', 'Li2']
+    ansatzes = ['SD-SJ', 'SD-SJBF', 'MD-SJ', 'MD-SJBF']
+    keys = sorted(product(systems, ansatzes))
+    with h5py.File(root / 'data/raw/data_pub_small_systems.h5', 'r') as f:
+        E_mean, n_steps = _stack_ragged(
+            [f[system][ansatz]['train'][...].mean(axis=1) for system, ansatz in keys]
+        )
+    E_ewm, E_err = ewm_trajectory(E_mean, outlier_maxlen=3, outlier=3, decay_alpha=10)
+    return _ragged_frame(keys, ['system', 'ansatz'], n_steps, energy=E_ewm, err=E_err)
+
+
+@stage(
+    'cyclobutadiene-fit',
+    inputs=[
+        'data/raw/cyclobutadiene/fit/*/*/*/fit.h5',
+        f'data/raw/cyclobutadiene/{STORE_NAME}',
+    ],
+)
+def cyclobutadiene_fit(root):
+    results = {}
+    fits = iter_results(root / 'data/raw/cyclobutadiene/fit', '*/*/*/fit.h5', 'E_loc')
+    for path, E_loc in fits:
+        batch, idx, state = path.parts[-4:-1]
+        batch, idx = int(batch.split('-')[1]), int(idx)
+        where_zero = (E_loc == 0).all(axis=-1).nonzero()[0]
+        E_loc[where_zero] = np.nan
+        results[batch, state, idx] = E_loc.mean(-1)
+    keys = sorted({key[:2] for key in results})
+    idxs = sorted({key[2] for key in results})
+    E_mean = np.full(
+        (len(keys), len(idxs), max(len(x) for x in results.values())), np.nan
+    )
+    for (batch, state, idx), x in results.items():
+        E_mean[keys.index((batch, state)), idxs.index(idx), : len(x)] = x
+    n_steps = np.array(
+        [max(len(x) for key, x in results.items() if key[:2] == k) for k in keys]
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        E_mean = np.nanmean(filter_outliers(E_mean, axis=1), axis=1)
+    E_ewm, _ = ewm_trajectory(E_mean)
+    return _ragged_frame(
+        keys, ['batch', 'state'], np.minimum(n_steps, 4500), energy_ewm=E_ewm
+    )
+
+
+@stage(
+    'cyclobutadiene-sample',
+    inputs=[
+        'data/raw/cyclobutadiene/sample/*/*/*/*/sample.h5',
+        f'data/raw/cyclobutadiene/{STORE_NAME}',
+    ],
+)
+def cyclobutadiene_sample(root):
+    def parse(path):
+        idx_smpl, batch, idx, state = path.parts[-5:-1]
+        return (int(batch.split('-')[1]), state, int(idx)), int(idx_smpl)
+
+    results = {}
+    samples = iter_results(
+        root / 'data/raw/cyclobutadiene/sample',
+        '*/*/*/*/sample.h5',
+        'blocks/energy',
+        order=parse,
+    )
+    for key, group in groupby(samples, lambda sample: parse(sample[0])[0]):
+        acc, energies = MeanErrAccumulator(), []
+        for _, energy in group:
+            acc.update_from(energy, np.s_[:, 0])
+            energies.append(energy[:, :, 0])
+        # independent samplings of the same state enter the blocking as extra walkers
+        with span('reblock'):
+            _, err_blocked, tau = reblock(_join_walkers(energies))
+        results[key] = pd.Series(
+            {
+                'energy': acc.mean,
+                'err': acc.err,
+                'n': acc.n,
+                'err_blocked': err_blocked,
+                'tau': tau,
+            }
+        )
+    with span('unstack'):
+        return (
+            pd.concat(results, names=['batch', 'state', 'idx'])
+            .unstack()
+            .sort_index()
+            .reset_index()
+        )
@@ -0,0 +1,46 @@
+import math
+from pathlib import Path
+
+import h5py
+import numpy as np
+import toml
+
+from .analysis import mean_err, reblock
+from .catalog import block_size
+from .store import read_dataset
+
+DEFAULT_SAMPLE_SIZE = 1_000
+
+
+def read_blocks(path):
+    path = Path(path)
+    if (path / 'sample.h5').exists():
+        with h5py.File(path / 'sample.h5', 'r', swmr=True) as f:
+            return f['blocks/energy'][..., 0]
+    with h5py.File(path / 'blocks.h5', 'r') as f:
+        return read_dataset(f, 'blocks/energy')
+
+
+def plan_sampling(pilot, params, target_err, min_blocks=16):
+    pilot = Path(pilot)
+    blocks = read_blocks(pilot)
+    _, err_blocked, tau = reblock(blocks)
+    # the blocked error is NaN without a plateau, the walker-based error holds for
+    # independent walkers
+    err = np.fmax(mean_err(blocks)[1], err_blocked)
+    pilot_params = toml.loads((pilot / 'param.toml').read_text())
+    sample_size = params.get('evaluate_kwargs', {}).get(
+        'sample_size', DEFAULT_SAMPLE_SIZE
+    )
+    # the squared error scales inversely with the number of sampled configurations
+    pilot_samples = blocks.size * block_size(pilot_params)
+    n_steps = pilot_samples / sample_size * (err / target_err) ** 2
+    n_blocks = math.ceil(n_steps / block_size(params)) if n_steps > 0 else 0
+    if n_blocks:
+        n_blocks = max(n_blocks, min_blocks)
+    return {
+        'err': float(err),
+        'tau': float(tau),
+        'n_blocks': n_blocks,
+        'n_steps': n_blocks * block_size(params),
+    }
@@ -0,0 +1,171 @@
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+_tracer = None
+
+
+def _clock():
+    # monotonic and shared by forked worker processes
+    return time.perf_counter_ns() // 1000
+
+
+def _bytes_read():
+    try:
+        with open('/proc/self/io') as f:
+            return int(next(line for line in f if line.startswith('rchar')).split()[1])
+    except OSError:
+        return 0
+
+
+def _peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Tracer:
+    def __init__(self, path):
+        self.path = Path(path).resolve()
+        self.parts = self.path.with_name(f'.{self.path.name}.parts')
+        self.pid = os.getpid()
+        self.start = _clock()
+        self.events = []
+        self.counters = {'files_opened': 0}
+        self.lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        return _clock(), {**self.counters, 'bytes_read': _bytes_read()}
+
+    def complete(self, name, start, args):
+        ts, counters = start
+        now, current = self.snapshot()
+        args = {
+            **args,
+            **{k: v - counters.get(k, 0) for k, v in current.items()},
+            'peak_rss': _peak_rss(),
+        }
+        pid, tid = os.getpid(), threading.get_ident()
+        self.record(
+            {
+                'name': name,
+                'ph': 'X',
+                'ts': ts,
+                'dur': now - ts,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            }
+        )
+        # cumulative per process, the totals are summed from the last ones
+        self.record({'name': 'io', 'ph': 'C', 'ts': now, 'pid': pid, 'args': current})
+        memory = {'peak_rss': args['peak_rss']}
+        self.record(
+            {'name': 'memory', 'ph': 'C', 'ts': now, 'pid': pid, 'args': memory}
+        )
+
+    def record(self, event):
+        if event['pid'] == self.pid:
+            with self.lock:
+                self.events.append(event)
+            return
+        # worker processes leave their events for the parent to merge
+        self.parts.mkdir(exist_ok=True)
+        with (self.parts / f'{event["pid"]}.jsonl').open('a') as f:
+            f.write(json.dumps(event) + '\n')
+
+    def finish(self, name):
+        self.complete(name, (self.start, {}), {'argv': sys.argv})
+        events = self.events
+        if self.parts.exists():
+            for part in sorted(self.parts.glob('*.jsonl')):
+                events.extend(
+                    json.loads(line) for line in part.read_text().splitlines()
+                )
+            shutil.rmtree(self.parts)
+        last = {e['pid']: e for e in events if e['ph'] == 'C' and e['name'] == 'io'}
+        totals = {}
+        for event in last.values():
+            for k, v in event['args'].items():
+                totals[k] = totals.get(k, 0) + v
+        totals['peak_rss'] = max(
+            e['args']['peak_rss'] for e in events if e['name'] == 'memory'
+        )
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'argv': sys.argv, 'totals': totals},
+        }
+        self.path.write_text(json.dumps(trace))
+
+
+def _counting_opens(func, arg):
+    # h5py also constructs File objects from open file ids
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if isinstance(args[arg], (str, bytes, os.PathLike)):
+            count('files_opened')
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def enable(path):
+    global _tracer
+
+    import h5py
+
+    _tracer = Tracer(path)
+    h5py.File.__init__ = _counting_opens(h5py.File.__init__, 1)
+    try:
+        import tables
+    except ImportError:
+        return
+    tables.open_file = _counting_opens(tables.open_file, 0)
+
+
+def finish(name='dlqmc'):
+    global _tracer
+
+    if _tracer and _tracer.pid == os.getpid():
+        _tracer.finish(name)
+        _tracer = None
+
+
+def count(name, n=1):
+    if _tracer:
+        _tracer.count(name, n)
+
+
+@contextmanager
+def span(name, **args):
+    tracer = _tracer
+    if not tracer:
+        yield
+        return
+    start = tracer.snapshot()
+    try:
+        yield
+    finally:
+        tracer.complete(name, start, args)
+
+
+def traced(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,232 @@
+import json
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import click
+import toml
+
+from .catalog import STOP_NAME, Catalog, chkpt_step, guess_kind, run_status
+
+LEASE_NAME = '.lease'
+DONE_NAME = '.done'
+LOG_NAME = 'run.log'
+DEFAULT_COMMAND = 'deepqmc {action} --no-cuda {path}'
+ACTIONS = {'train': 'train', 'sample': 'evaluate'}
+THREAD_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+
+
+class Lease:
+    def __init__(self, path, ttl=600):
+        self.path = Path(path) / LEASE_NAME
+        self.ttl = ttl
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def _create(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'owner': self.owner, 'acquired': time.time()}, f)
+        return True
+
+    def _expired(self, path):
+        return time.time() - path.stat().st_mtime > self.ttl
+
+    def acquire(self):
+        if self._create():
+            return True
+        stale = self.path.with_name(f'{LEASE_NAME}.{self.owner.rsplit(":", 1)[1]}')
+        try:
+            if not self._expired(self.path):
+                return False
+            # a rename succeeds for only one of several competing workers
+            os.rename(self.path, stale)
+        except FileNotFoundError:
+            return self._create()
+        if not self._expired(stale):
+            # renamed a lease that was renewed or retaken in the meantime
+            try:
+                os.link(stale, self.path)
+            except FileExistsError:
+                pass
+            stale.unlink()
+            return False
+        stale.unlink()
+        return self._create()
+
+    def owned(self):
+        try:
+            return json.loads(self.path.read_text())['owner'] == self.owner
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def renew(self):
+        if not self.owned():
+            return False
+        os.utime(self.path)
+        return True
+
+    def release(self):
+        if self.owned():
+            self.path.unlink()
+
+
+def _n_steps(path):
+    params = toml.loads((path / 'param.toml').read_text())
+    return params.get('train_kwargs', {}).get('n_steps', 10_000)
+
+
+def is_done(path, kind):
+    if (path / DONE_NAME).exists():
+        return True
+    n_steps = _n_steps(path) if kind == 'train' else None
+    return run_status(path, kind, n_steps) in {'stopped', 'sampled', 'trained'}
+
+
+def find_runs(tree):
+    tree = Path(tree)
+    catalog = Catalog.find(tree)
+    if catalog:
+        with catalog:
+            runs = [
+                (path, kind)
+                for kind in ['train', 'sample']
+                for path, _ in catalog.runs(kind=kind, under=tree)
+            ]
+    else:
+        runs = [(p.parent, guess_kind(p.parent)) for p in tree.glob('**/param.toml')]
+    return [(path, kind) for path, kind in sorted(runs) if not is_done(path, kind)]
+
+
+def resume_state(path):
+    chkpts = sorted((path / 'chkpts').glob('state-*.pt'), key=chkpt_step)
+    state = path / 'state.pt'
+    if not chkpts or state.exists() and not state.is_symlink():
+        return None
+    if state.is_symlink():
+        state.unlink()
+    state.symlink_to(Path('chkpts') / chkpts[-1].name)
+    return chkpts[-1]
+
+
+class Executor:
+    def __init__(
+        self, tree, slots, threads=1, command=DEFAULT_COMMAND, ttl=600, wait=False
+    ):
+        self.tree = Path(tree)
+        self.slots = slots
+        self.threads = threads
+        self.command = command
+        self.ttl = ttl
+        self.wait = wait
+        self.failed = set()
+        self._queue = []
+        self._procs = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _pending(self):
+        return [run for run in find_runs(self.tree) if run[0] not in self.failed]
+
+    def _claim(self):
+        with self._lock:
+            for rescan in [False, True]:
+                if self._stop.is_set():
+                    return None
+                if rescan:
+                    self._queue = self._pending()
+                while self._queue:
+                    path, kind = self._queue.pop(0)
+                    lease = Lease(path, self.ttl)
+                    if not lease.acquire():
+                        continue
+                    if is_done(path, kind):
+                        lease.release()
+                        continue
+                    return path, kind, lease
+
+    def _execute(self, path, kind, lease):
+        try:
+            if kind == 'train' and resume_state(path):
+                click.echo(f'{path}: resuming from {os.readlink(path / "state.pt")}')
+            else:
+                click.echo(f'{path}: starting')
+            cmd = self.command.format(
+                action=ACTIONS[kind], path=shlex.quote(str(path.resolve()))
+            )
+            env = {**os.environ, **{var: str(self.threads) for var in THREAD_VARS}}
+            with (path / LOG_NAME).open('a') as log:
+                proc = subprocess.Popen(
+                    shlex.split(cmd), stdout=log, stderr=subprocess.STDOUT, env=env
+                )
+                self._procs.add(proc)
+                while True:
+                    try:
+                        returncode = proc.wait(self.ttl / 4)
+                        break
+                    except subprocess.TimeoutExpired:
+                        if (path / STOP_NAME).exists():
+                            click.echo(f'{path}: stopped early')
+                            proc.terminate()
+                            proc.wait()
+                            return
+                        if not lease.renew():
+                            click.echo(f'{path}: lease lost, stopping')
+                            proc.terminate()
+                            proc.wait()
+                            return
+            self._procs.discard(proc)
+            if self._stop.is_set():
+                click.echo(f'{path}: interrupted')
+                return
+            if returncode:
+                self.failed.add(path)
+                click.echo(f'{path}: failed with exit code {returncode}')
+                return
+            (path / DONE_NAME).touch()
+            click.echo(f'{path}: done')
+            catalog = Catalog.find(path)
+            if catalog:
+                with catalog:
+                    n_steps = _n_steps(path) if kind == 'train' else None
+                    catalog.set_status(path, run_status(path, kind, n_steps))
+        finally:
+            lease.release()
+
+    def _slot(self):
+        while not self._stop.is_set():
+            claim = self._claim()
+            if claim:
+                self._execute(*claim)
+            elif self.wait and self._pending():
+                self._stop.wait(self.ttl / 4)
+            else:
+                return
+
+    def stop(self, *args):
+        self._stop.set()
+        for proc in list(self._procs):
+            proc.terminate()
+
+    def run(self):
+        workers = [threading.Thread(target=self._slot) for _ in range(self.slots)]
+        signal.signal(signal.SIGTERM, self.stop)
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(1)
+        except KeyboardInterrupt:
+            self.stop()
+            for worker in workers:
+                worker.join()
+        return self.failed
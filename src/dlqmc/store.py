@@ -0,0 +1,326 @@
+import os
+import warnings
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+
+import h5py
+import numpy as np
+
+from .profiling import span
+
+STORE_NAME = 'consolidated.h5'
+DATASETS = {
+    'fit.h5': ['E_loc'],
+    'sample.h5': ['blocks/energy'],
+    'blocks.h5': ['blocks/energy'],
+}
+MAX_NDIM = 4
+CHUNK_SIZE = 2 ** 16
+INDEX_DTYPE = np.dtype(
+    [
+        ('key', h5py.string_dtype()),
+        ('name', h5py.string_dtype()),
+        ('offset', np.int64),
+        ('shape', np.int64, (MAX_NDIM,)),
+        ('mtime', np.int64),
+        ('size', np.int64),
+    ]
+)
+DIRS_DTYPE = np.dtype([('path', h5py.string_dtype()), ('mtime', np.int64)])
+
+
+def _str(x):
+    return x.decode() if isinstance(x, bytes) else x
+
+
+def _match(parts, pattern):
+    if not pattern:
+        return not parts
+    if pattern[0] == '**':
+        return any(_match(parts[i:], pattern[1:]) for i in range(len(parts) + 1))
+    return (
+        bool(parts)
+        and fnmatchcase(parts[0], pattern[0])
+        and _match(parts[1:], pattern[1:])
+    )
+
+
+def checking_files():
+    # by default the index of a consolidated store is trusted as is
+    return os.environ.get('DLQMC_CHECK_FILES', '0') == '1'
+
+
+def find_store_root(path):
+    path = Path(path).resolve()
+    for parent in [path, *path.parents]:
+        if (parent / STORE_NAME).exists():
+            return parent
+
+
+def _stat(path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _dir_mtimes(tree):
+    dirs = []
+    for dirpath, _, _ in os.walk(tree):
+        path = Path(dirpath)
+        dirs.append((path.relative_to(tree).as_posix(), path.stat().st_mtime_ns))
+    return np.array(dirs, DIRS_DTYPE)
+
+
+def read_dataset(f, name):
+    if name in f:
+        return f[name][...]
+    # blocks written by pytables are a table with an energy column
+    parent, field = name.rsplit('/', 1)
+    table = f.get(parent)
+    if not isinstance(table, h5py.Dataset) or field not in (table.dtype.names or ()):
+        raise KeyError(name)
+    return table[field]
+
+
+class ResultStore:
+    def __init__(self, root, mode='r', filename=STORE_NAME):
+        self.root = Path(root).resolve()
+        self.mode = mode
+        self.file = h5py.File(self.root / filename, mode)
+        if 'index' in self.file:
+            self.rows = self.file['index'][...]
+        else:
+            self.rows = np.empty(0, INDEX_DTYPE)
+        # modification times of the directories at consolidation
+        if 'dirs' in self.file:
+            self.dirs = self.file['dirs'][...]
+        else:
+            self.dirs = np.empty(0, DIRS_DTYPE)
+        self.index = {
+            (_str(row['key']), _str(row['name'])): i for i, row in enumerate(self.rows)
+        }
+
+    @classmethod
+    def find(cls, path):
+        root = find_store_root(path)
+        if root:
+            return cls(root)
+
+    def flush(self):
+        if self.mode == 'r':
+            return
+        if 'index' not in self.file:
+            self.file.create_dataset(
+                'index', (0,), INDEX_DTYPE, maxshape=(None,), chunks=(1024,)
+            )
+        ds = self.file['index']
+        ds.resize((len(self.rows),))
+        ds[...] = self.rows
+        if 'dirs' in self.file:
+            del self.file['dirs']
+        self.file.create_dataset('dirs', data=self.dirs)
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def key(self, path):
+        return Path(path).relative_to(self.root).as_posix()
+
+    def stat(self, key, name):
+        i = self.index.get((key, name))
+        if i is None:
+            return None
+        return int(self.rows[i]['mtime']), int(self.rows[i]['size'])
+
+    def read(self, key, name):
+        row = self.rows[self.index[key, name]]
+        shape = tuple(int(n) for n in row['shape'] if n >= 0)
+        start = int(row['offset'])
+        data = self.file['data'][name][start : start + int(np.prod(shape))]
+        return data.reshape(shape)
+
+    def append(self, key, name, array, stat):
+        array = np.asarray(array)
+        if array.ndim > MAX_NDIM:
+            raise ValueError(f'{key}: {name} has more than {MAX_NDIM} dimensions')
+        group = self.file.require_group('data')
+        if name not in group:
+            group.create_dataset(
+                name,
+                (0,),
+                array.dtype,
+                maxshape=(None,),
+                chunks=(CHUNK_SIZE,),
+                compression='gzip',
+                shuffle=True,
+            )
+        ds = group[name]
+        # data of updated files is appended, the index then points to the new copy
+        offset = len(ds)
+        ds.resize((offset + array.size,))
+        ds[offset:] = array.ravel()
+        row = np.zeros((), INDEX_DTYPE)
+        row['key'], row['name'], row['offset'] = key, name, offset
+        row['shape'] = [*array.shape, *[-1] * (MAX_NDIM - array.ndim)]
+        row['mtime'], row['size'] = stat
+        i = self.index.get((key, name))
+        if i is None:
+            self.index[key, name] = len(self.rows)
+            self.rows = np.append(self.rows, row)
+        else:
+            self.rows[i] = row
+
+    def wasted(self):
+        # fraction of the data taken by superseded copies of updated files
+        if 'data' not in self.file:
+            return 0.0
+        names = {name for _, name in self.index}
+        total = sum(len(self.file['data'][name]) for name in names)
+        shapes = [[n for n in row['shape'] if n >= 0] for row in self.rows]
+        live = sum(int(np.prod(shape)) for shape in shapes)
+        return 1 - live / total if total else 0.0
+
+    def changed_files(self, base, pattern, name):
+        # files are only added to or replaced in directories whose modification
+        # time changed, returns None when the directories were not recorded
+        base = Path(base).resolve()
+        dirs = {
+            self.root.joinpath(*PurePosixPath(_str(row['path'])).parts): row['mtime']
+            for row in self.dirs
+        }
+        if base not in dirs:
+            return None
+        pattern = PurePosixPath(pattern).parts
+        changed = set()
+        for path, mtime in dirs.items():
+            if base != path and base not in path.parents:
+                continue
+            try:
+                if path.stat().st_mtime_ns == mtime:
+                    continue
+                entries = list(os.scandir(path))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                child = Path(entry.path)
+                if entry.is_dir() and child not in dirs:
+                    candidates = child.glob('**/*')
+                else:
+                    candidates = [child]
+                for file in candidates:
+                    if not _match(file.relative_to(base).parts, pattern):
+                        continue
+                    stat = self.stat(self.key(file), name)
+                    if file.is_file() and _stat(file) != stat:
+                        changed.add(file)
+        return changed
+
+    def match(self, base, pattern, name):
+        prefix = Path(base).resolve().relative_to(self.root).parts
+        pattern = PurePosixPath(pattern).parts
+        found = {}
+        for key, name_ in self.index:
+            parts = PurePosixPath(key).parts
+            if (
+                name_ == name
+                and parts[: len(prefix)] == prefix
+                and _match(parts[len(prefix) :], pattern)
+            ):
+                found[self.root.joinpath(*parts)] = key
+        return found
+
+
+def compact_store(root):
+    root = Path(root).resolve()
+    tmp = f'.{STORE_NAME}.tmp'
+    with ResultStore(root) as store, ResultStore(root, 'w', tmp) as compacted:
+        for key, name in store.index:
+            array = store.read(key, name)
+            compacted.append(key, name, array, store.stat(key, name))
+        compacted.dirs = store.dirs
+    (root / tmp).replace(root / STORE_NAME)
+
+
+def consolidate_tree(tree, max_wasted=0.5):
+    tree = Path(tree).resolve()
+    if (tree / STORE_NAME).exists():
+        with ResultStore(tree) as store:
+            wasted = store.wasted()
+        if wasted > max_wasted:
+            compact_store(tree)
+    with ResultStore(tree, 'a') as store:
+        # recorded before the files are read, files added meanwhile count as new
+        store.dirs = _dir_mtimes(tree)
+        for filename, names in DATASETS.items():
+            for path in sorted(tree.glob(f'**/{filename}')):
+                key = store.key(path)
+                stat = _stat(path)
+                if all(store.stat(key, name) == stat for name in names):
+                    continue
+                with h5py.File(path, 'r', swmr=True) as f:
+                    arrays = {}
+                    for name in names:
+                        try:
+                            arrays[name] = read_dataset(f, name)
+                        except KeyError:
+                            pass
+                for name, array in arrays.items():
+                    store.append(key, name, array, stat)
+                if arrays:
+                    yield key
+
+
+def locate_results(base, pattern, name, found=None, check_files=None):
+    # the store, all result files under base and those read from the store;
+    # files changed since consolidation are read directly
+    base = Path(base).resolve()
+    check_files = checking_files() if check_files is None else check_files
+    store = ResultStore.find(base)
+    if not store:
+        paths = set(base.glob(pattern) if found is None else found)
+        return None, paths, {}
+    stored = store.match(base, pattern, name)
+    changed = None if check_files else store.changed_files(base, pattern, name)
+    if changed is None:
+        if not check_files:
+            warnings.warn(
+                f'{store.root / STORE_NAME} has no record of {base}, reading all '
+                'files, update it with dlqmc consolidate'
+            )
+        found = set(base.glob(pattern) if found is None else found)
+        changed = {
+            path for path in found if _stat(path) != store.stat(store.key(path), name)
+        }
+    paths = {*stored, *changed}
+    from_store = {path: key for path, key in stored.items() if path not in changed}
+    return store, paths, from_store
+
+
+def iter_results(base, pattern, name, order=None, check_files=None):
+    with span('glob', pattern=pattern):
+        store, paths, stored = locate_results(
+            base, pattern, name, check_files=check_files
+        )
+    try:
+        for path in sorted(paths, key=order):
+            if path in stored:
+                with span('store.read'):
+                    array = store.read(stored[path], name)
+                yield path, array
+                continue
+            with span('hdf5.read'), h5py.File(path, 'r', swmr=True) as f:
+                try:
+                    array = read_dataset(f, name)
+                except KeyError:
+                    continue
+            yield path, array
+    finally:
+        if store:
+            store.close()
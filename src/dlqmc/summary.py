@@ -0,0 +1,142 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from .analysis import ewm_trajectory, infinite_training_limit, mean_err
+from .catalog import Catalog, chkpt_step, guess_kind
+from .store import read_dataset
+
+SUMMARY_NAME = 'summary.json'
+SOURCES = ['fit.h5', 'sample.h5', 'blocks.h5']
+
+
+def find_all_runs(tree):
+    tree = Path(tree)
+    catalog = Catalog.find(tree)
+    if catalog:
+        with catalog:
+            return sorted(
+                (path, kind)
+                for kind in ['train', 'sample']
+                for path, _ in catalog.runs(kind=kind, under=tree)
+            )
+    return sorted((p.parent, guess_kind(p.parent)) for p in tree.glob('**/param.toml'))
+
+
+def downsample_steps(n_steps, n_points):
+    return np.unique(np.linspace(0, n_steps - 1, n_points).round().astype(int))
+
+
+def read_fit_energy(path):
+    with h5py.File(path / 'fit.h5', 'r', swmr=True) as f:
+        ds = f['E_loc']
+        E_mean = np.empty(len(ds))
+        for i in range(0, len(ds), 256):
+            E_loc = ds[i : i + 256]
+            E_mean[i : i + 256] = np.where(
+                E_loc.any(axis=-1), E_loc.mean(axis=-1), np.nan
+            )
+    if not np.isfinite(E_mean).any():
+        return E_mean[:0]
+    # the last rows may have been allocated but not written yet
+    return E_mean[: len(E_mean) - np.isfinite(E_mean[::-1]).argmax()]
+
+
+def _train_summary(path, n_points, start):
+    E_mean = read_fit_energy(path)
+    n_steps = len(E_mean)
+    if not n_steps:
+        return {'step': 0}
+    E_ewm, E_err = ewm_trajectory(E_mean)
+    step = downsample_steps(n_steps, n_points)
+    summary = {
+        'step': int(n_steps),
+        'energy': float(E_ewm[-1]),
+        'err': float(E_err[-1]),
+        'trajectory': {
+            'step': step.tolist(),
+            'energy': E_ewm[step].tolist(),
+            'err': E_err[step].tolist(),
+        },
+    }
+    if n_steps > start:
+        Einf, _, _ = infinite_training_limit(E_mean, start)
+        summary['Einf'], summary['Einf_err'] = Einf.n, Einf.s
+    return summary
+
+
+def _sample_summary(path):
+    if (path / 'sample.h5').exists():
+        with h5py.File(path / 'sample.h5', 'r', swmr=True) as f:
+            ds = f['blocks/energy']
+            ene, err = mean_err(ds, np.s_[..., 0])
+            n_blocks = len(ds)
+    else:
+        with h5py.File(path / 'blocks.h5', 'r') as f:
+            blocks = read_dataset(f, 'blocks/energy')
+            ene, err = mean_err(blocks)
+            n_blocks = len(blocks)
+    return {'n_blocks': n_blocks, 'energy': float(ene), 'err': float(err)}
+
+
+def summarize_run(path, kind, n_points=200, start=100, force=False):
+    sources = [path / name for name in SOURCES if (path / name).exists()]
+    if not sources:
+        return None
+    out = path / SUMMARY_NAME
+    mtime = max(p.stat().st_mtime_ns for p in sources)
+    if not force and out.exists() and out.stat().st_mtime_ns >= mtime:
+        return None
+    try:
+        if kind == 'train':
+            summary = _train_summary(path, n_points, start)
+        else:
+            summary = _sample_summary(path)
+    except (KeyError, OSError) as e:
+        # runs still being written or left corrupt are summarized next time
+        print(f'{path}: skipped, cannot read results ({e})')
+        return None
+    chkpts = list((path / 'chkpts').glob('state-*.pt'))
+    summary['chkpt'] = max(map(chkpt_step, chkpts)) if chkpts else None
+    summary['kind'] = kind
+    tmp = out.with_suffix('.tmp')
+    tmp.write_text(json.dumps(summary))
+    tmp.replace(out)
+    return out
+
+
+def summarize_tree(tree, n_points=200, start=100, force=False, workers=None):
+    runs = find_all_runs(tree)
+    if not runs:
+        return []
+    paths, kinds = zip(*runs)
+    n = len(paths)
+    with ProcessPoolExecutor(workers) as executor:
+        outs = executor.map(
+            summarize_run,
+            paths,
+            kinds,
+            [n_points] * n,
+            [start] * n,
+            [force] * n,
+            chunksize=8,
+        )
+        return [out for out in outs if out]
+
+
+def load_summaries(tree):
+    import pandas as pd
+
+    tree = Path(tree)
+    rows, trajectories = [], {}
+    for path in sorted(tree.glob(f'**/{SUMMARY_NAME}')):
+        run = path.parent.relative_to(tree).as_posix()
+        summary = json.loads(path.read_text())
+        trajectory = summary.pop('trajectory', None)
+        if trajectory:
+            trajectories[run] = pd.DataFrame(trajectory).set_index('step')
+        rows.append({'run': run, **summary})
+    return pd.DataFrame(rows).set_index('run'), trajectories
@@ -0,0 +1,75 @@
+import math
+import re
+from itertools import chain, product
+
+import numpy as np
+
+from .catalog import flatten_params, param_hash
+from .tools import NestedDict
+
+DISTRIBUTIONS = {
+    'uniform': lambda u, lo, hi: lo + u * (hi - lo),
+    'log_uniform': lambda u, lo, hi: math.exp(
+        math.log(lo) + u * (math.log(hi) - math.log(lo))
+    ),
+    'int_uniform': lambda u, lo, hi: min(hi, lo + int(u * (hi - lo + 1))),
+    'choice': lambda u, *choices: choices[min(len(choices) - 1, int(u * len(choices)))],
+}
+
+
+def _flatten_axes(table, prefix=''):
+    axes = {}
+    for key, val in table.items():
+        if isinstance(val, dict) and not set(val) <= set(DISTRIBUTIONS):
+            axes.update(_flatten_axes(val, f'{prefix}{key}.'))
+        else:
+            axes[f'{prefix}{key}'] = val
+    return axes
+
+
+def _grid(grid):
+    axes = _flatten_axes(grid)
+    for values in product(*axes.values()):
+        yield dict(zip(axes, values))
+
+
+def _unit_samples(n, d, mode, rng):
+    if mode == 'random':
+        return rng.random((n, d))
+    if mode == 'lhs':
+        strata = np.stack([rng.permutation(n) for _ in range(d)], axis=-1)
+        return (strata + rng.random((n, d))) / n
+    raise ValueError(f'Unknown sweep mode: {mode}')
+
+
+def _sample(dists, n, mode, seed):
+    axes = _flatten_axes(dists)
+    units = _unit_samples(n, len(axes), mode, np.random.default_rng(seed))
+    for u in units:
+        point = {}
+        for (key, dist), ui in zip(axes.items(), u):
+            ((name, args),) = dist.items()
+            val = DISTRIBUTIONS[name](float(ui), *args)
+            point[key] = val.item() if isinstance(val, np.generic) else val
+        yield point
+
+
+def format_label(template, params):
+    flat = flatten_params(params)
+    return re.sub(r'\{([^}]+)\}', lambda m: str(flat[m.group(1)]), template)
+
+
+def expand_sweep(spec):
+    mode = spec.get('mode', 'grid')
+    if mode == 'grid':
+        grids = spec.get('grid', {})
+        grids = grids if isinstance(grids, list) else [grids]
+        points = chain.from_iterable(_grid(grid) for grid in grids)
+    else:
+        points = _sample(spec['random'], spec['n'], mode, spec.get('seed', 0))
+    for point in points:
+        params = NestedDict(spec.get('base', {}))
+        for key, val in point.items():
+            params[key] = val
+        label = spec.get('label')
+        yield format_label(label, params) if label else param_hash(params)[:12], params
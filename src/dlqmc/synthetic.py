@@ -0,0 +1,145 @@
+from itertools import product
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+H10_DISTANCES = [1.2, 1.4, 1.6, 1.8, 2.0, 2.4, 2.8, 3.2, 3.6]
+H10_ANSATZES = ['SD-SJ', 'SD-SJBF', 'MD-SJBF']
+SMALL_SYSTEMS = ['H2', 'LiH', 'Be', 'B', 'Li2', 'C']
+SMALL_ANSATZES = ['SD-SJ', 'SD-SJBF', 'MD-SJ', 'MD-SJBF']
+DIATOMICS = ['Li2', 'Be2', 'B2', 'C2']
+DIATOMICS_DETS = [1, 3, 10, 30, 100]
+CBD_STATES = ['ground', 'transition']
+
+
+def autocorrelated(rng, shape, phi=0.8, loc=0.0, scale=1.0):
+    # AR(1) process along the first axis with unit stationary variance
+    noise = rng.standard_normal(shape)
+    x = np.empty(shape)
+    x[0] = noise[0]
+    for i in range(1, shape[0]):
+        x[i] = phi * x[i - 1] + np.sqrt(1 - phi ** 2) * noise[i]
+    return (loc + scale * x).astype(np.float32)
+
+
+def training_energies(rng, n_steps, batch_size, energy=-1.0, scale=0.5):
+    step = np.arange(n_steps)[:, None]
+    E_loc = energy + scale * 100 / (100 + step)
+    return (E_loc + scale * rng.standard_normal((n_steps, batch_size))).astype(
+        np.float32
+    )
+
+
+def sampled_blocks(rng, n_blocks, n_walkers, energy=-1.0, scale=0.01):
+    energies = autocorrelated(rng, (n_blocks, n_walkers), loc=energy, scale=scale)
+    errs = np.full_like(energies, scale)
+    return np.stack([energies, errs], axis=-1)
+
+
+def write_fit(path, E_loc, n_unwritten=0):
+    # deepqmc allocates rows ahead of the training steps, these stay zero
+    with h5py.File(path, 'w') as f:
+        ds = f.create_dataset(
+            'E_loc', (len(E_loc) + n_unwritten, E_loc.shape[1]), E_loc.dtype
+        )
+        ds[: len(E_loc)] = E_loc
+
+
+def write_sample(path, blocks):
+    with h5py.File(path, 'w') as f:
+        f['blocks/energy'] = blocks
+
+
+def write_blocks(path, energies):
+    # blocks written by pytables, a table with an energy column
+    dtype = np.dtype([('energy', energies.dtype, energies.shape[1:])])
+    table = np.empty(len(energies), dtype)
+    table['energy'] = energies
+    with h5py.File(path, 'w') as f:
+        f['blocks'] = table
+
+
+def write_run_tree(
+    root,
+    n_systems=4,
+    n_ansatzes=4,
+    n_blocks=100,
+    n_walkers=100,
+    n_steps=1000,
+    batch_size=100,
+    kind='blocks',
+    seed=0,
+):
+    root = Path(root)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i, j in product(range(n_systems), range(n_ansatzes)):
+        path = root / f'system-{i}' / f'ansatz-{j}'
+        path.mkdir(parents=True, exist_ok=True)
+        energy = -(i + 1) - j / 100
+        if kind == 'train':
+            write_fit(
+                path / 'fit.h5', training_energies(rng, n_steps, batch_size, energy)
+            )
+        elif kind == 'sample':
+            write_sample(
+                path / 'sample.h5', sampled_blocks(rng, n_blocks, n_walkers, energy)
+            )
+        else:
+            blocks = sampled_blocks(rng, n_blocks, n_walkers, energy)
+            write_blocks(path / 'blocks.h5', blocks[..., 0])
+        # sampled runs are complete for the default block size
+        params = f'[evaluate_kwargs]\nn_steps = {10 * n_blocks}\n'
+        (path / 'param.toml').write_text(params if kind == 'sample' else '')
+        paths.append(path)
+    return paths
+
+
+def write_pub_files(
+    root, n_blocks=100, n_walkers=100, n_steps=1000, batch_size=100, seed=0
+):
+    raw = Path(root) / 'data/raw'
+    raw.mkdir(parents=True, exist_ok=True)
+    (Path(root) / 'data/final').mkdir(exist_ok=True)
+    rng = np.random.default_rng(seed)
+    with h5py.File(raw / 'data_pub_h10.h5', 'w') as f:
+        for d, ansatz in product(H10_DISTANCES, H10_ANSATZES):
+            blocks = sampled_blocks(rng, n_blocks, n_walkers, -5.0)
+            f[f'H10_d{d}/{ansatz}/evaluate'] = blocks
+    with h5py.File(raw / 'data_pub_small_systems.h5', 'w') as f:
+        for system, ansatz in product(SMALL_SYSTEMS, SMALL_ANSATZES):
+            group = f.create_group(f'{system}/{ansatz}')
+            group['evaluate'] = sampled_blocks(rng, n_blocks, n_walkers)
+            group['train'] = training_energies(rng, n_steps, batch_size)
+    with h5py.File(raw / 'data_pub_diatomics.h5', 'w') as f:
+        for system, n_det in product(DIATOMICS, DIATOMICS_DETS):
+            blocks = sampled_blocks(rng, n_blocks, n_walkers)
+            f[f'{system}/{n_det}det/evaluate'] = blocks
+    return raw
+
+
+def write_cyclobutadiene(
+    root,
+    batch_sizes=(250, 500),
+    n_runs=3,
+    n_samplings=2,
+    n_steps=1000,
+    n_blocks=100,
+    n_walkers=100,
+    seed=0,
+):
+    base = Path(root) / 'data/raw/cyclobutadiene'
+    rng = np.random.default_rng(seed)
+    for batch_size, idx, state in product(batch_sizes, range(n_runs), CBD_STATES):
+        run = f'bs-{batch_size}/{idx}/{state}'
+        path = base / 'fit' / run
+        path.mkdir(parents=True, exist_ok=True)
+        E_loc = training_energies(rng, n_steps, batch_size, -154.5)
+        write_fit(path / 'fit.h5', E_loc, n_unwritten=n_steps // 10)
+        for idx_smpl in range(n_samplings):
+            path = base / 'sample' / str(idx_smpl) / run
+            path.mkdir(parents=True, exist_ok=True)
+            blocks = sampled_blocks(rng, n_blocks, n_walkers, -154.5)
+            write_sample(path / 'sample.h5', blocks)
+    return base
@@ -1,45 +1,121 @@
-import chemcoord
+import json
+
 import numpy as np
-import pandas as pd
 
-from deepqmc.molecule import Molecule, angstrom
+ANGSTROM = 1 / 0.52917721092
 
+ABSOLUTE_REFS = {
+    'origin': [0.0, 0.0, 0.0],
+    'e_x': [1.0, 0.0, 0.0],
+    'e_y': [0.0, 1.0, 0.0],
+    'e_z': [0.0, 0.0, 1.0],
+}
 
-def from_zmat(zmat, **kwargs):
-    zmat = chemcoord.Zmat(
-        pd.DataFrame(zmat, columns='atom b bond a angle d dihedral'.split())
-    )
-    cart = zmat.get_cartesian()
-    coords = cart[['x', 'y', 'z']].values.astype(np.float32) * angstrom
-    charges = cart['atom']
+ZMATS = {
+    'cyclobutadiene': [
+        [6, 'origin', 0.0, 'e_x', 0.0, 'e_y', 0.0],
+        [6, 0, 'rcc1', 'e_x', 0.0, 'e_y', 0.0],
+        [6, 1, 'rcc2', 0, 90.0, 'e_y', 0.0],
+        [6, 2, 'rcc1', 1, 90.0, 'e_y', 0.0],
+        [1, 0, 'rch', 1, 'acch', 2, 180.0],
+        [1, 1, 'rch', 0, 'acch', 3, 180.0],
+        [1, 2, 'rch', 3, 'acch', 0, 180.0],
+        [1, 3, 'rch', 2, 'acch', 1, 180.0],
+    ],
+}
+
+GEOMETRIES = {
+    'cyclobutadiene_ground': (
+        'cyclobutadiene',
+        {'rcc1': 1.564, 'rcc2': 1.354, 'rch': 1.079, 'acch': 134.94},
+    ),
+    'cyclobutadiene_transition': (
+        'cyclobutadiene',
+        {'rcc1': 1.451, 'rcc2': 1.451, 'rch': 1.078, 'acch': 135.0},
+    ),
+}
+
+_geometry_cache = {}
+
+
+def zmat_params(zmat):
+    return sorted({x for row in zmat for x in row[2::2] if isinstance(x, str)})
+
+
+def zmat_to_cartesian(zmat, values=None):
+    values = {k: np.asarray(v, dtype=float) for k, v in (values or {}).items()}
+    n = len(next(iter(values.values()))) if values else 1
+    X = np.empty((n, len(zmat), 3))
+
+    def ref_pos(ref):
+        pos = ABSOLUTE_REFS[ref] if isinstance(ref, str) else X[:, ref]
+        return np.broadcast_to(pos, (n, 3))
+
+    def value(x):
+        return values[x] if isinstance(x, str) else np.full(n, float(x))
+
+    for j, (_, b, bond, a, angle, d, dihedral) in enumerate(zmat):
+        v_b, v_a, v_d = ref_pos(b), ref_pos(a), ref_pos(d)
+        BA, AD = v_a - v_b, v_d - v_a
+        with np.errstate(invalid='ignore', divide='ignore'):
+            e_z = -BA / np.linalg.norm(BA, axis=-1, keepdims=True)
+            N = np.cross(AD, BA)
+            e_y = N / np.linalg.norm(N, axis=-1, keepdims=True)
+        e_x = np.cross(e_y, e_z)
+        r = value(bond)
+        alpha, delta = np.radians(value(angle)), np.radians(value(dihedral))
+        S = np.stack(
+            [
+                r * np.sin(alpha) * np.cos(delta),
+                -r * np.sin(alpha) * np.sin(delta),
+                -r * np.cos(alpha),
+            ],
+            axis=-1,
+        )
+        X[:, j] = v_b + S[:, :1] * e_x + S[:, 1:2] * e_y + S[:, 2:] * e_z
+        if not np.isfinite(X[:, j]).all():
+            raise ValueError(f'Invalid reference for atom {j}: {b}, {a}, {d}')
+    return X
+
+
+def scan_geometries(zmat, points):
+    rows = ZMATS[zmat] if isinstance(zmat, str) else zmat
+    names = zmat_params(rows)
+    for point in points:
+        if sorted(point) != names:
+            raise ValueError(f'Expected parameters {names}, got {sorted(point)}')
+    key = zmat if isinstance(zmat, str) else json.dumps(zmat)
+    keys = [(key, tuple(point[name] for name in names)) for point in points]
+    missing = list(dict.fromkeys(k for k in keys if k not in _geometry_cache))
+    if missing:
+        values = dict(zip(names, np.array([k[1] for k in missing]).T))
+        coords = zmat_to_cartesian(rows, values if names else None)
+        _geometry_cache.update(zip(missing, coords))
+    return np.stack([_geometry_cache[k] for k in keys])
+
+
+def _zmat_molecule(zmat, params, **kwargs):
+    from deepqmc.molecule import Molecule
+
+    rows = ZMATS[zmat] if isinstance(zmat, str) else zmat
+    coords = scan_geometries(zmat, [params])[0].astype(np.float32) * ANGSTROM
+    charges = [row[0] for row in rows]
     return Molecule(coords, charges, **kwargs)
 
 
+def zmat_system(zmat, charge=0, spin=0, **params):
+    return _zmat_molecule(zmat, params, charge=charge, spin=spin)
+
+
+def from_zmat(zmat, **kwargs):
+    return _zmat_molecule(zmat, {}, **kwargs)
+
+
 def cyclobutadiene_ground():
-    rcc2, rcc1, rch, acch = 1.354, 1.564, 1.079, 134.94
-    zmat = [
-        [6, 'origin', 0.0, 'e_x', 0.0, 'e_y', 0.0],
-        [6, 0, rcc1, 'e_x', 0.0, 'e_y', 0.0],
-        [6, 1, rcc2, 0, 90.0, 'e_y', 0.0],
-        [6, 2, rcc1, 1, 90.0, 'e_y', 0.0],
-        [1, 0, rch, 1, acch, 2, 180.0],
-        [1, 1, rch, 0, acch, 3, 180.0],
-        [1, 2, rch, 3, acch, 0, 180.0],
-        [1, 3, rch, 2, acch, 1, 180.0],
-    ]
-    return from_zmat(zmat, charge=0, spin=0)
+    zmat, params = GEOMETRIES['cyclobutadiene_ground']
+    return zmat_system(zmat, charge=0, spin=0, **params)
 
 
 def cyclobutadiene_transition():
-    rcc, rch = 1.451, 1.078
-    zmat = [
-        [6, 'origin', 0.0, 'e_x', 0.0, 'e_y', 0.0],
-        [6, 0, rcc, 'e_x', 0.0, 'e_y', 0.0],
-        [6, 1, rcc, 0, 90.0, 'e_y', 0.0],
-        [6, 2, rcc, 1, 90.0, 'e_y', 0.0],
-        [1, 0, rch, 1, 135.0, 2, 180.0],
-        [1, 1, rch, 0, 135.0, 3, 180.0],
-        [1, 2, rch, 3, 135.0, 0, 180.0],
-        [1, 3, rch, 2, 135.0, 1, 180.0],
-    ]
-    return from_zmat(zmat, charge=0, spin=0)
+    zmat, params = GEOMETRIES['cyclobutadiene_transition']
+    return zmat_system(zmat, charge=0, spin=0, **params)
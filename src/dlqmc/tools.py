@@ -1,5 +1,59 @@
-import uncertainties
+def short_fmt(x):
+    from .uarray import UArray, format_shorthand
 
+    if isinstance(x, UArray):
+        formatted = format_shorthand(x.n, x.s)
+        return formatted if formatted.ndim else formatted.item()
+    if hasattr(x, 'std_dev'):
+        return format_shorthand(x.nominal_value, x.std_dev).item()
+    return x
 
-def short_fmt(x):
-    return f'{x:S}' if isinstance(x, uncertainties.core.AffineScalarFunc) else x
+
+# copy of deepqmc.utils.NestedDict, keep in sync; importing deepqmc.utils imports
+# torch, which would take seconds on every prepare command
+class NestedDict(dict):
+    def __init__(self, dct=None):
+        super().__init__()
+        if dct:
+            self.update(dct)
+
+    def _split_key(self, key):
+        key, *nested_key = key.split('.', 1)
+        return (key, nested_key[0]) if nested_key else (key, None)
+
+    def __getitem__(self, key):
+        key, nested_key = self._split_key(key)
+        try:
+            val = super().__getitem__(key)
+        except KeyError:
+            val = NestedDict()
+            super().__setitem__(key, val)
+        if nested_key:
+            return val[nested_key]
+        return val
+
+    def __setitem__(self, key, val):
+        key, nested_key = self._split_key(key)
+        if nested_key:
+            self[key][nested_key] = val
+        else:
+            super().__setitem__(key, val)
+
+    def __delitem__(self, key):
+        key, nested_key = self._split_key(key)
+        if nested_key:
+            del super().__getitem__(key)[nested_key]
+        else:
+            super().__delitem__(key)
+
+    def update(self, other):
+        for key, val in other.items():
+            if isinstance(val, dict):
+                if not isinstance(self[key], NestedDict):
+                    if isinstance(self[key], dict):
+                        self[key] = NestedDict(self[key])
+                    else:
+                        self[key] = NestedDict()
+                super().__getitem__(key).update(val)
+            else:
+                super().__setitem__(key, val)
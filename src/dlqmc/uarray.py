@@ -0,0 +1,184 @@
+import numpy as np
+
+# powers of ten of the builtin pow, np.power is one ulp off for some exponents
+POW10 = np.array([10.0 ** k for k in range(-400, 309)])
+
+
+def _parts(x):
+    if isinstance(x, UArray):
+        return x.n, x.s
+    return np.asarray(x, dtype=float), 0.0
+
+
+def _pow10(k):
+    return POW10[np.clip(k, -400, 308) + 400]
+
+
+def _first_digit(x):
+    x = np.abs(x)
+    nonzero = np.isfinite(x) & (x > 0)
+    return np.where(nonzero, np.floor(np.log10(np.where(nonzero, x, 1))), 0).astype(int)
+
+
+def _product_err(a, b):
+    # rounding error of a * b (Dekker 1971)
+    def split(x):
+        c = 134217729.0 * x
+        hi = c - (c - x)
+        return hi, x - hi
+
+    p = a * b
+    (a_hi, a_lo), (b_hi, b_lo) = split(a), split(b)
+    return ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+
+
+def _round(x, ndigits):
+    # like the builtin round, which rounds the exact value rather than the scaled
+    # one, halves of the scaled value are resolved by its rounding error
+    scale = _pow10(np.abs(ndigits))
+    y = np.where(ndigits >= 0, x * scale, x / scale)
+    p = y * scale
+    residual = np.where(
+        ndigits >= 0, _product_err(x, scale), (x - p) - _product_err(y, scale)
+    )
+    floor = np.floor(y)
+    rounded = np.where(
+        (y - floor == 0.5) & (residual != 0), floor + (residual > 0), np.rint(y)
+    )
+    return np.where(ndigits >= 0, rounded / scale, rounded * scale)
+
+
+def _pdg_precision(s):
+    # significant digits of the error by the PDG rounding rule
+    exponent = _first_digit(s)
+    factor = np.where(exponent >= 0, 1, 1000)
+    exponent = np.where(exponent >= 0, exponent - 2, exponent + 1)
+    digits = (s / _pow10(exponent) * factor).astype(int)
+    n_digits = np.where((354 < digits) & (digits <= 949), 1, 2)
+    s = np.where(digits > 949, _pow10(exponent) * (1000 / factor), s)
+    return n_digits, s
+
+
+def _digits_limit(x, n_digits):
+    limit = _first_digit(x) - n_digits + 1
+    return limit + (_first_digit(_round(x, -limit)) > _first_digit(x))
+
+
+def _format_unique(fmt, x):
+    # exponents and error digits take only few values
+    values, idxs = np.unique(x, return_inverse=True)
+    return np.array([fmt.format(v) for v in values.tolist()])[idxs.reshape(x.shape)]
+
+
+def _join(kind, n, s, prec, err, exp):
+    if kind == 'raw':
+        return f'{n}({s:f})'
+    if kind == 'plain':
+        return f'{n}({"0" if s == 0 else format(s, "f")}){exp}'
+    if kind == 'fixed':
+        err = f'{s:.{prec}f}'
+    return f'{n:.{prec}f}({err}){exp}'
+
+
+def format_shorthand(n, s):
+    # follows the ':S' format of uncertainties, including its common exponent
+    n, s = np.broadcast_arrays(np.asarray(n, dtype=float), np.asarray(s, dtype=float))
+    shape, n, s = n.shape, n.ravel(), s.ravel()
+    with np.errstate(all='ignore'):
+        ref = np.fmax(
+            np.where(np.isfinite(n), np.abs(n), np.nan),
+            np.where(np.isfinite(s), s, np.nan),
+        )
+        finite = ~np.isnan(ref)
+        ref = np.where(finite, ref, 1.0)
+        with_err = np.isfinite(n) & np.isfinite(s) & (s != 0)
+        n_digits, s_pdg = _pdg_precision(np.where(with_err, s, 1.0))
+        s_pdg = np.where(with_err, s_pdg, s)
+        limit = np.where(
+            with_err,
+            _digits_limit(np.where(with_err, s_pdg, 1.0), n_digits),
+            _digits_limit(ref, 12),
+        )
+        exp = _first_digit(_round(ref, -limit))
+        scaled = ~(((-4 <= exp) & (limit < 1)) | (_pow10(exp) == 0))
+        scale = np.where(scaled, _pow10(exp), 1.0)
+        n_scaled, s_scaled = n / scale, s_pdg / scale
+        prec = np.maximum(np.where(scaled, exp - limit, -limit), 0)
+        err = _round(s_scaled, prec)
+        digits = np.rint(err * _pow10(prec))
+        plain = (s_scaled == 0) | ~np.isfinite(s_scaled)
+        fixed = (_first_digit(err) >= 0) & (prec > 0)
+    kind = np.select([~finite, plain, fixed], ['raw', 'plain', 'fixed'], 'digits')
+    digits = np.where(kind == 'digits', digits, 0).astype(np.int64)
+    err_str = np.where(err == 0, '0.', _format_unique('{:d}', digits))
+    exp_str = np.where(scaled & finite, _format_unique('e{:+03d}', exp), '')
+    n = np.where(finite, n_scaled, n)
+    s = np.select([~finite, plain], [s, s_scaled], err)
+    formatted = [
+        _join(*args)
+        for args in zip(*(x.tolist() for x in [kind, n, s, prec, err_str, exp_str]))
+    ]
+    return np.array(formatted, dtype=object).reshape(shape)
+
+
+class UArray:
+    __array_priority__ = 1000
+
+    def __init__(self, n, s=0.0):
+        n, s = np.broadcast_arrays(
+            np.asarray(n, dtype=float), np.asarray(s, dtype=float)
+        )
+        self.n, self.s = n[()], s[()]
+
+    @property
+    def shape(self):
+        return np.shape(self.n)
+
+    def __len__(self):
+        return len(self.n)
+
+    def __getitem__(self, key):
+        return UArray(self.n[key], self.s[key])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        formatted = format_shorthand(self.n, self.s)
+        return f'UArray({formatted if formatted.ndim else formatted.item()})'
+
+    def __neg__(self):
+        return UArray(-self.n, self.s)
+
+    def __abs__(self):
+        return UArray(np.abs(self.n), self.s)
+
+    def __add__(self, other):
+        n, s = _parts(other)
+        return UArray(self.n + n, np.hypot(self.s, s))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        n, s = _parts(other)
+        return UArray(self.n - n, np.hypot(self.s, s))
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        n, s = _parts(other)
+        return UArray(self.n * n, np.hypot(self.s * n, self.n * s))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        n, s = _parts(other)
+        return UArray(self.n / n, np.hypot(self.s / n, self.n * s / n ** 2))
+
+    def __rtruediv__(self, other):
+        return UArray(other) / self
+
+
+def corr_fraction(energy, hf, exact):
+    return (hf - energy) / (hf - exact)